@@ -1,11 +1,18 @@
 from enum import Enum
+import logging
 import numpy as np
+from pong_log import logger
+
+STATE_SIZE = 10 # my paddle (3), opponent paddle (3), ball (4)
 
 class Direction(Enum):
     neutral = 0
     down = 1
     up = 2
 
+# sign of the paddle's y speed for each Direction value, multiply by the paddle speed
+DIRECTION_SIGNS = (0, 1, -1)
+
 class GameStateParameters():
     def __init__(self, game_w=0, game_h=0, max_paddle_speed=0, max_momentum=0, max_ball_speed_x=0, max_ball_speed_y=0):
         self.game_w = game_w
@@ -15,6 +22,18 @@ class GameStateParameters():
         self.max_ball_speed_x = max_ball_speed_x
         self.max_ball_speed_y = max_ball_speed_y
 
+    def get_normalization(self):
+        # scale and offset so that value * scale + offset == min max normalized value, in State order
+        mins = np.array([0, -self.max_speed, -self.max_momentum,
+                         0, -self.max_speed, -self.max_momentum,
+                         0, 0, -self.max_ball_speed_x, -self.max_ball_speed_y], dtype=np.float64)
+        maxes = np.array([self.game_h, self.max_speed, self.max_momentum,
+                          self.game_h, self.max_speed, self.max_momentum,
+                          self.game_w, self.game_h, self.max_ball_speed_x, self.max_ball_speed_y], dtype=np.float64)
+        scale = 1 / (maxes - mins)
+        offset = -mins * scale
+        return scale.astype(np.float32), offset.astype(np.float32)
+
 class State():
     def __init__(self, game_state_parameters=GameStateParameters(), 
                  my_center_y=0, my_speed=0, my_momentum=0, 
@@ -47,42 +66,60 @@ class State():
         self.ball_center_y = self.normalize_min_max(0, self.game_state_parameters.game_h, self.ball_center_y)
         self.ball_speed_x = self.normalize_min_max(-self.game_state_parameters.max_ball_speed_x, self.game_state_parameters.max_ball_speed_x, self.ball_speed_x)
         self.ball_speed_y = self.normalize_min_max(-self.game_state_parameters.max_ball_speed_y, self.game_state_parameters.max_ball_speed_y, self.ball_speed_y)
-        
-        print(self.ball_speed_x)
 
 
     def normalize_min_max(self, min, max, value):
         normalized_value = (value - min) / (max - min)
-        print(f"normalizing value: {value} to {normalized_value}")
+        logger.debug("normalizing value: %s to %s", value, normalized_value)
         return normalized_value
 
-    def print_state(self):
-        print("state: ")
-        print(f"{self.my_center_y}, {self.my_speed}, {self.my_momentum}")
-        print(f"{self.opponent_center_y}, {self.opponent_momentum}, {self.opponent_speed}")
-        print(f"{self.ball_center_x}, {self.ball_center_y}, {self.ball_speed_x}, {self.ball_speed_y}")
-        print()
+    def print_state(self, level=logging.DEBUG):
+        logger.log(level, "state: %s, %s, %s | %s, %s, %s | %s, %s, %s, %s",
+                   self.my_center_y, self.my_speed, self.my_momentum,
+                   self.opponent_center_y, self.opponent_momentum, self.opponent_speed,
+                   self.ball_center_x, self.ball_center_y, self.ball_speed_x, self.ball_speed_y)
 
 class Agent():
-    def __init__(self):
-        self.brain = 0
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.brain = 0 # a policy with choose_direction, e.g. PolicyNetwork. 0 plays randomly
         self.direction = Direction.neutral
         self.normalizedState = State()
+        # normalized observation, usually a view into the game's shared observation buffer
+        self.observation = np.zeros(STATE_SIZE, dtype=np.float32)
+
+    def play_move(self) -> None:
+        if self.brain:
+            self.direction = self.brain.choose_direction(self.observation)
+        else:
+            self.play_random_move()
 
     def play_random_move(self) -> None:
-        random_number = np.random.randint(0, 3)
+        random_number = self.rng.integers(0, 3)
 
         self.direction = Direction(random_number)
     
     def set_normalized_state(self, state: State) -> None:
-        print("state received: ")
-        state.print_state()
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("state received:")
+            state.print_state()
 
         state.normalize_state()
-        print("normalized state: ")
-        state.print_state()
+        if debug:
+            logger.debug("normalized state:")
+            state.print_state()
         self.normalizedState = state
 
+class RandomPolicy():
+    # batched policy interface: act takes an (n, STATE_SIZE) matrix of observations, one row per
+    # paddle, and returns n Direction values in one call
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def act(self, observations):
+        return self.rng.integers(0, len(Direction), size=len(observations))
+
 if __name__ == "__main__":
     my_agent = Agent()
     print(my_agent.brain)
@@ -0,0 +1,229 @@
+import numpy as np
+from agent import Direction, GameStateParameters, STATE_SIZE, DIRECTION_SIGNS
+from pong_sim import (DEFAULT_PADDLE_SPEED, MAX_BALL_SPEED_X, MAX_BALL_SPEED_Y, MAX_MAGNITUDE,
+                      DEFAULT_RESET_WAIT, MAX_MOMENTUM, MOMENTUM_SCALING, WINNING_SCORE, get_hit_speeds)
+
+PADDLE_W = 10
+PADDLE_H = 100
+PADDLE_OFFSET = 20 # distance of paddle centers from the side walls
+BALL_W = 10
+BALL_H = 10
+
+# paddle y speed for each Direction value
+DIRECTION_SPEEDS = np.array(DIRECTION_SIGNS, dtype=np.float64) * DEFAULT_PADDLE_SPEED
+
+SERVE_SPEEDS = np.array([2, 3, -3, -2])
+
+class BatchPong:
+    # steps n games at once, all state is kept as structure-of-arrays.
+    # index 0 along the player axis is player 1 (left), index 1 is player 2 (right)
+    def __init__(self, n_games, w=640, h=480, seed=None):
+        self.n_games = n_games
+        self.w = w
+        self.h = h
+        self.rng = np.random.default_rng(seed)
+
+        self.paddle_x = np.array([PADDLE_OFFSET, w - PADDLE_OFFSET], dtype=np.float64)
+        self.paddle_y = np.empty((n_games, 2))
+        self.paddle_speed = np.empty((n_games, 2))
+        self.momentum = np.empty((n_games, 2))
+
+        self.ball_x = np.empty(n_games)
+        self.ball_y = np.empty(n_games)
+        self.ball_speed_x = np.empty(n_games)
+        self.ball_speed_y = np.empty(n_games)
+        self.reset_wait = np.empty(n_games, dtype=np.int64)
+
+        self.scores = np.empty((n_games, 2), dtype=np.int64)
+        self.game_over = np.empty(n_games, dtype=bool)
+
+        self.states = np.empty((n_games, 2, STATE_SIZE))
+        self.observations = np.empty((n_games, 2, STATE_SIZE), dtype=np.float32)
+        game_state_parameters = GameStateParameters(w, h, DEFAULT_PADDLE_SPEED, MAX_MOMENTUM,
+                                                    MAX_BALL_SPEED_X, MAX_BALL_SPEED_Y)
+        self.observation_scale, self.observation_offset = game_state_parameters.get_normalization()
+
+        self.reset()
+
+    def reset(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.n_games, dtype=bool)
+
+        self.paddle_y[mask] = self.h/2
+        self.paddle_speed[mask] = 0
+        self.momentum[mask] = 0
+
+        self.ball_x[mask] = self.w/2
+        self.ball_y[mask] = self.h/2
+        self.ball_speed_x[mask] = 0
+        self.ball_speed_y[mask] = 0
+        self.reset_wait[mask] = 0
+
+        self.scores[mask] = 0
+        self.game_over[mask] = False
+
+    def step(self, actions, repeat=1):
+        # actions is an (n_games, 2) array of Direction values, held for repeat frames.
+        # rewards are summed over those frames
+        scores_before = self.scores.copy()
+        speeds = DIRECTION_SPEEDS[np.asarray(actions)]
+        newly_over = np.zeros(self.n_games, dtype=bool)
+
+        for _ in range(repeat):
+            active = ~self.game_over
+            self.paddle_speed[active] = speeds[active]
+
+            self.check_collisions(active)
+            self.reset_balls(active)
+            self.move_gameobjects(active)
+
+            over = active & (self.scores >= WINNING_SCORE).any(axis=1)
+            self.game_over |= over
+            newly_over |= over
+
+        rewards = (self.scores - scores_before).astype(np.float64)
+        rewards = rewards - rewards[:, ::-1]
+
+        return self.get_states(), rewards, newly_over
+
+    def check_collisions(self, active):
+        # ball with ceiling or floor
+        bounce = active & ((self.ball_y - BALL_H/2 < 0) | (self.ball_y + BALL_H/2 > self.h))
+        self.ball_speed_y[bounce] *= -1
+        self.clamp_speed(bounce)
+
+        # ball with score zones
+        self.scores[:, 1] += active & (self.ball_x - BALL_W/2 < 0)
+        self.scores[:, 0] += active & (self.ball_x + BALL_W/2 > self.w)
+
+        # ball with paddles
+        ball_top = self.ball_y - BALL_H/2
+        ball_bottom = self.ball_y + BALL_H/2
+        in_front = ((ball_bottom[:, None] > self.paddle_y - PADDLE_H/2) &
+                    (ball_top[:, None] < self.paddle_y + PADDLE_H/2))
+
+        ball_left = self.ball_x - BALL_W/2
+        ball_right = self.ball_x + BALL_W/2
+        hit_1 = (active & in_front[:, 0] &
+                 (ball_left >= self.paddle_x[0] - PADDLE_W/2) &
+                 (ball_left < self.paddle_x[0] + PADDLE_W/2))
+        self.get_hit(hit_1, 0)
+
+        hit_2 = (active & in_front[:, 1] &
+                 (ball_right <= self.paddle_x[1] + PADDLE_W/2) &
+                 (ball_right > self.paddle_x[1] - PADDLE_W/2))
+        self.get_hit(hit_2, 1)
+
+    def get_hit(self, mask, player):
+        idx = np.flatnonzero(mask)
+        if len(idx) == 0:
+            return
+
+        x_speed_scale = self.rng.integers(100, 150, size=len(idx)) / 100
+
+        self.ball_speed_x[idx], self.ball_speed_y[idx] = get_hit_speeds(self.ball_speed_x[idx], self.ball_speed_y[idx],
+                                                                        self.momentum[idx, player], x_speed_scale)
+        self.clamp_speed(mask)
+
+    def clamp_speed(self, mask):
+        idx = np.flatnonzero(mask)
+        if len(idx) == 0:
+            return
+
+        speed_x = np.clip(self.ball_speed_x[idx], -MAX_BALL_SPEED_X, MAX_BALL_SPEED_X)
+        speed_y = np.clip(self.ball_speed_y[idx], -MAX_BALL_SPEED_Y, MAX_BALL_SPEED_Y)
+
+        magnitude = np.sqrt(speed_x**2 + speed_y**2)
+        too_fast = (speed_x != 0) & (magnitude > MAX_MAGNITUDE)
+        if too_fast.any():
+            angle = np.tan(speed_y[too_fast] / speed_x[too_fast])
+            speed_x[too_fast] = MAX_MAGNITUDE * np.cos(angle)
+            speed_y[too_fast] = MAX_MAGNITUDE * np.sin(angle)
+
+        self.ball_speed_x[idx] = speed_x
+        self.ball_speed_y[idx] = speed_y
+
+    def reset_balls(self, active):
+        scored = active & ((self.ball_x - BALL_W/2 < 0) | (self.ball_x + BALL_W/2 > self.w))
+        self.ball_speed_x[scored] = 0
+        self.ball_speed_y[scored] = 0
+        self.ball_x[scored] = self.w/2
+        self.ball_y[scored] = self.h/2
+
+        waiting = active & ~scored & (self.reset_wait > 0)
+        serving = active & ~scored & (self.reset_wait == 0)
+        self.reset_wait[waiting | serving] -= 1
+        self.reset_wait[scored] = DEFAULT_RESET_WAIT
+
+        n_serving = np.count_nonzero(serving)
+        if n_serving:
+            self.ball_speed_x[serving] = self.rng.choice(SERVE_SPEEDS, size=n_serving)
+            self.ball_speed_y[serving] = 0
+
+    def move_gameobjects(self, active):
+        # move paddles, paddles at the screen edges don't move or gain momentum
+        new_y = self.paddle_y + self.paddle_speed
+        moving = (active[:, None] &
+                  (new_y - PADDLE_H/2 >= 0) & (new_y + PADDLE_H/2 <= self.h))
+        self.increment_momentum(moving)
+        self.paddle_y[moving] = new_y[moving]
+
+        # move balls
+        self.ball_x[active] += self.ball_speed_x[active]
+        self.ball_y[active] += self.ball_speed_y[active]
+
+    def increment_momentum(self, mask):
+        speed = self.paddle_speed
+        momentum = self.momentum
+
+        stopped = mask & (speed == 0)
+        momentum[stopped] = 0
+
+        moving = mask & (speed != 0)
+        next_momentum = momentum + speed
+        direction_change = moving & (np.abs(momentum) == MAX_MOMENTUM) & (np.abs(next_momentum) < np.abs(momentum))
+        momentum[direction_change] = 0
+
+        below_max = moving & (np.abs(momentum) < MAX_MOMENTUM)
+        momentum[below_max] += speed[below_max] * MOMENTUM_SCALING
+
+    def get_states(self):
+        # same layout as State: own paddle, opponent paddle, then the ball
+        for player in range(2):
+            opponent = 1 - player
+            self.states[:, player, 0] = self.paddle_y[:, player]
+            self.states[:, player, 1] = self.paddle_speed[:, player]
+            self.states[:, player, 2] = self.momentum[:, player]
+            self.states[:, player, 3] = self.paddle_y[:, opponent]
+            self.states[:, player, 4] = self.paddle_speed[:, opponent]
+            self.states[:, player, 5] = self.momentum[:, opponent]
+            self.states[:, player, 6] = self.ball_x
+            self.states[:, player, 7] = self.ball_y
+            self.states[:, player, 8] = self.ball_speed_x
+            self.states[:, player, 9] = self.ball_speed_y
+
+        return self.states
+
+    def get_observations(self):
+        # normalized float32 copy of get_states, written into the same buffer every call
+        np.multiply(self.get_states(), self.observation_scale, out=self.observations, casting='unsafe')
+        self.observations += self.observation_offset
+        return self.observations
+
+
+if __name__ == "__main__":
+    import time
+
+    n_games = 4096
+    frames = 1000
+    game = BatchPong(n_games, seed=0)
+    rng = np.random.default_rng(1)
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        actions = rng.integers(0, len(Direction), size=(n_games, 2))
+        states, rewards, done = game.step(actions)
+        game.reset(done)
+    elapsed = time.perf_counter() - start
+
+    print(f"{n_games * frames / elapsed:.0f} game steps per second")
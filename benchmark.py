@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+
+# render benchmarks draw into an offscreen surface, no window needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+from agent import State
+from pong_sim import Pong_Sim, Ball, Point, Speed_Vector, WHITE
+from batch_pong import BatchPong
+
+DEFAULT_RESULTS = "benchmark_results.json"
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.10 # allowed slowdown before a result counts as a regression
+DEFAULT_REPEATS = 5
+BATCH_GAMES = 1024
+
+def time_per_call(function, iterations, repeats):
+    # best of repeats, in seconds per call
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best
+
+def make_game(game_class=Pong_Sim, **kwargs):
+    game = game_class("player 1", "player 2", seed=0, **kwargs)
+
+    def step():
+        game_over, _ = game.step_frame()
+        if game_over:
+            game.restart()
+
+    return game, step
+
+def bench_step_headless(iterations, repeats):
+    game, step = make_game()
+    return time_per_call(step, iterations, repeats)
+
+def bench_step_rendered(iterations, repeats):
+    from pong_ai import Pong_AI
+
+    game, step = make_game(Pong_AI, game_speed=0)
+    game.first_serve = True
+    return time_per_call(step, iterations, repeats)
+
+def bench_update_screen(iterations, repeats):
+    from pong_ai import Pong_AI
+
+    game = Pong_AI("player 1", "player 2", game_speed=0, seed=0)
+    return time_per_call(game.update_screen, iterations, repeats)
+
+def bench_check_collisions(iterations, repeats):
+    game, step = make_game()
+    for _ in range(20):
+        step()
+    return time_per_call(game.check_collisions, iterations, repeats)
+
+def bench_send_states(iterations, repeats):
+    game, step = make_game()
+    return time_per_call(game.send_states, iterations, repeats)
+
+def bench_clamp_speed(iterations, repeats):
+    ball = Ball(Point(320, 240), 10, 10, WHITE, 640, 480, np.random.default_rng(0))
+    ball.change_speed(Speed_Vector(8, 15))
+    return time_per_call(ball.clamp_speed, iterations, repeats)
+
+def bench_normalize_state(iterations, repeats):
+    game, step = make_game()
+    parameters = game.game_state_parameters
+
+    def normalize():
+        state = State(parameters, 240, 6, 30, 200, -6, -12, 320, 100, 5, -3)
+        state.normalize_state()
+
+    return time_per_call(normalize, iterations, repeats)
+
+def bench_batch_step(iterations, repeats):
+    game = BatchPong(BATCH_GAMES, seed=0)
+    actions = np.random.default_rng(0).integers(0, 3, size=(BATCH_GAMES, 2))
+
+    def step():
+        states, rewards, done = game.step(actions)
+        game.reset(done)
+
+    # reported per game step so it is comparable with the single game numbers
+    return time_per_call(step, iterations, repeats) / BATCH_GAMES
+
+# name, function, iterations per repeat
+BENCHMARKS = (
+    ("step_headless", bench_step_headless, 20000),
+    ("step_rendered", bench_step_rendered, 2000),
+    ("update_screen", bench_update_screen, 2000),
+    ("check_collisions", bench_check_collisions, 20000),
+    ("send_states", bench_send_states, 20000),
+    ("clamp_speed", bench_clamp_speed, 100000),
+    ("normalize_state", bench_normalize_state, 20000),
+    ("batch_step", bench_batch_step, 200),
+)
+
+def run_benchmarks(names=None, repeats=DEFAULT_REPEATS, scale=1.0):
+    results = {}
+    for name, function, iterations in BENCHMARKS:
+        if names and name not in names:
+            continue
+        seconds = function(max(1, int(iterations * scale)), repeats)
+        results[name] = {"seconds_per_call": seconds, "calls_per_second": 1 / seconds}
+        print(f"{name:>18}: {1 / seconds:12.0f} calls/s  {seconds * 1e6:10.2f} us/call")
+    return results
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    # returns the names of benchmarks that got slower than the baseline by more than tolerance
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["seconds_per_call"]
+        after = result["seconds_per_call"]
+        change = after / before - 1
+        status = "REGRESSION" if change > tolerance else "ok"
+        print(f"{name:>18}: {change:+7.1%} vs baseline  {status}")
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+def save(path, results):
+    document = {"python": platform.python_version(), "machine": platform.machine(),
+                "time": time.time(), "results": results}
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2)
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)["results"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all by default")
+    parser.add_argument("--output", default=DEFAULT_RESULTS, help="where to write the results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="results file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="also store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown, 0.1 is 10%%")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the iteration counts")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.names, args.repeats, args.scale)
+    save(args.output, results)
+
+    if args.save_baseline:
+        save(args.baseline, results)
+    elif os.path.exists(args.baseline):
+        if compare(results, load(args.baseline), args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,53 @@
+import numpy as np
+from agent import STATE_SIZE, RandomPolicy
+from pong_sim import Pong_Sim
+
+class GameGroup():
+    # n headless games whose observations live in one (n_games, 2, STATE_SIZE) matrix,
+    # so a policy decides every paddle of every game in a single act call.
+    # every decision is held for action_repeat frames
+    def __init__(self, n_games, policy, w=640, h=480, seed=None, action_repeat=1):
+        self.n_games = n_games
+        self.policy = policy
+        self.action_repeat = action_repeat
+        self.observations = np.zeros((n_games, 2, STATE_SIZE), dtype=np.float32)
+        self.paddle_observations = self.observations.reshape(n_games * 2, STATE_SIZE)
+        self.dones = np.zeros(n_games, dtype=bool)
+
+        game_seeds = np.random.SeedSequence(seed).spawn(n_games)
+        self.games = []
+        for index in range(n_games):
+            game = Pong_Sim(f"game {index} player 1", f"game {index} player 2", w, h, seed=game_seeds[index])
+            game.attach_observations(self.observations[index])
+            self.games.append(game)
+
+    def step(self):
+        actions = self.policy.act(self.paddle_observations).reshape(self.n_games, 2)
+
+        for index, (game, (action1, action2)) in enumerate(zip(self.games, actions.tolist())):
+            game.apply_actions(action1, action2)
+            for _ in range(self.action_repeat):
+                game_over, _ = game.step_physics()
+                if game_over:
+                    break
+            game.send_states()
+            self.dones[index] = game_over
+            if game_over:
+                game.restart()
+
+        return self.observations, actions, self.dones
+
+
+if __name__ == "__main__":
+    import time
+
+    n_games = 256
+    group = GameGroup(n_games, RandomPolicy(np.random.default_rng(0)), seed=0)
+
+    frames = 200
+    start = time.perf_counter()
+    for _ in range(frames):
+        group.step()
+    elapsed = time.perf_counter() - start
+
+    print(f"{n_games * frames / elapsed:.0f} game steps per second")
@@ -0,0 +1,292 @@
+import asyncio
+import struct
+import argparse
+import numpy as np
+import pong_log
+from pong_log import logger
+from agent import Direction, GameStateParameters, STATE_SIZE, RandomPolicy
+from pong_sim import (DEFAULT_PADDLE_SPEED, MAX_MOMENTUM, MAX_BALL_SPEED_X, MAX_BALL_SPEED_Y,
+                      PHYSICS_HZ, Pong_Sim)
+
+# wire format, all little endian:
+#   client -> server  JOIN    magic, match id (ANY_MATCH for the first free seat)
+#   server -> client  WELCOME magic, match id, player (0 when there was no free seat), game w, h, tick rate
+#   server -> client  STATE   tick, game over, score 1, score 2, then the player's STATE_SIZE float32 observation
+#   client -> server  ACTION  tick the action answers, Direction value
+MAGIC = b"PNG1"
+JOIN = struct.Struct("<4si")
+WELCOME = struct.Struct("<4sIBHHf")
+STATE_HEADER = struct.Struct("<IBBB")
+STATE_FRAME_SIZE = STATE_HEADER.size + 4 * STATE_SIZE
+ACTION = struct.Struct("<IB")
+ANY_MATCH = -1
+
+DEFAULT_PORT = 5555
+DEFAULT_MATCHES = 100
+DEFAULT_TICK_RATE = PHYSICS_HZ # ticks per second, an action has until the next tick to arrive
+MAX_WRITE_BUFFER = 64 * STATE_FRAME_SIZE # bytes queued for a client before its frames are dropped
+
+class Seat():
+    # one player's connection. action is whatever arrived last, so a late agent keeps its previous action
+    def __init__(self):
+        self.writer = None
+        self.action = Direction.neutral.value
+        self.answered_tick = -1
+        self.late_ticks = 0
+        self.dropped_frames = 0
+
+    def reset(self):
+        self.action = Direction.neutral.value
+        self.answered_tick = -1
+
+class Match():
+    # a headless game that only runs while both seats are taken.
+    # remote actions stand in for agent_input, every tick ends with send_states
+    def __init__(self, match_id, w=640, h=480, seed=None, swept_collisions=False):
+        self.match_id = match_id
+        self.game = Pong_Sim(f"match {match_id} player 1", f"match {match_id} player 2", w, h,
+                             seed=seed, swept_collisions=swept_collisions)
+        self.seats = (Seat(), Seat())
+        self.running = False
+        self.tick = 0
+
+    def free_seat(self):
+        # player number of an empty seat, 0 if both are taken
+        for player, seat in enumerate(self.seats, 1):
+            if seat.writer is None:
+                return player
+        return 0
+
+    def start(self):
+        self.game.restart()
+        self.tick = 0
+        for seat in self.seats:
+            seat.reset()
+        self.running = True
+        self.send_frames()
+
+    def step(self):
+        game = self.game
+        seat1, seat2 = self.seats
+        for seat in self.seats:
+            if seat.answered_tick < self.tick:
+                seat.late_ticks += 1
+        self.tick += 1
+
+        game.apply_actions(seat1.action, seat2.action)
+        game_over, _ = game.step_physics()
+        game.send_states()
+        self.send_frames()
+
+        if game_over:
+            game.restart()
+
+    def send_frames(self):
+        game = self.game
+        for player, seat in enumerate(self.seats):
+            writer = seat.writer
+            if writer is None:
+                continue
+            if writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                # the client is not reading, skip frames instead of queueing them
+                seat.dropped_frames += 1
+                continue
+            writer.write(STATE_HEADER.pack(self.tick, game.game_over,
+                                           game.player1.current_score, game.player2.current_score)
+                         + game.observations[player].tobytes())
+
+class GameServer():
+    # hosts many matches on one event loop. A single ticker steps every running match,
+    # connections only read actions into their seat
+    def __init__(self, n_matches=DEFAULT_MATCHES, w=640, h=480, tick_rate=DEFAULT_TICK_RATE, seed=None, swept_collisions=False):
+        self.w = w
+        self.h = h
+        self.tick_rate = tick_rate
+        match_seeds = np.random.SeedSequence(seed).spawn(n_matches)
+        self.matches = [Match(index, w, h, match_seeds[index], swept_collisions) for index in range(n_matches)]
+        self.servers = []
+        self.ticks = 0
+
+    async def listen(self, host=None, port=DEFAULT_PORT, path=None):
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        self.servers.append(server)
+        return server
+
+    def find_seat(self, match_id):
+        if match_id == ANY_MATCH:
+            candidates = self.matches
+        elif 0 <= match_id < len(self.matches):
+            candidates = (self.matches[match_id],)
+        else:
+            candidates = ()
+
+        for match in candidates:
+            player = match.free_seat()
+            if player:
+                return match, player
+        return None, 0
+
+    async def handle_connection(self, reader, writer):
+        try:
+            magic, match_id = JOIN.unpack(await reader.readexactly(JOIN.size))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        if magic != MAGIC:
+            logger.warning("closing connection with bad magic %r", magic)
+            writer.close()
+            return
+
+        match, player = self.find_seat(match_id)
+        if match is None:
+            writer.write(WELCOME.pack(MAGIC, 0, 0, self.w, self.h, self.tick_rate))
+            writer.close()
+            return
+
+        writer.write(WELCOME.pack(MAGIC, match.match_id, player, self.w, self.h, self.tick_rate))
+        seat = match.seats[player - 1]
+        seat.writer = writer
+        logger.info("player %d joined match %d", player, match.match_id)
+        if match.free_seat() == 0:
+            match.start()
+
+        try:
+            while True:
+                tick, action = ACTION.unpack(await reader.readexactly(ACTION.size))
+                if action < len(Direction) and tick >= seat.answered_tick:
+                    seat.action = action
+                    seat.answered_tick = tick
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            seat.writer = None
+            match.running = False
+            writer.close()
+            logger.info("player %d left match %d", player, match.match_id)
+
+    def step(self):
+        for match in self.matches:
+            if match.running:
+                match.step()
+        self.ticks += 1
+
+    async def run(self, ticks=None):
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.tick_rate
+        next_tick = loop.time()
+        while ticks is None or self.ticks < ticks:
+            self.step()
+
+            next_tick += interval
+            delay = next_tick - loop.time()
+            if delay < 0:
+                # fell behind, start over from now instead of bursting ticks
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def close(self):
+        for server in self.servers:
+            server.close()
+
+    def get_stats(self):
+        seats = [seat for match in self.matches for seat in match.seats]
+        return {"running": sum(match.running for match in self.matches),
+                "late_ticks": sum(seat.late_ticks for seat in seats),
+                "dropped_frames": sum(seat.dropped_frames for seat in seats)}
+
+class GameClient():
+    # one remote player. read_frame returns the tick, game over flag, scores and the player's observation
+    def __init__(self, reader, writer, match_id, player, w, h, tick_rate):
+        self.reader = reader
+        self.writer = writer
+        self.match_id = match_id
+        self.player = player
+        self.w = w
+        self.h = h
+        self.tick_rate = tick_rate
+        self.game_state_parameters = GameStateParameters(w, h, DEFAULT_PADDLE_SPEED, MAX_MOMENTUM,
+                                                         MAX_BALL_SPEED_X, MAX_BALL_SPEED_Y)
+
+    @classmethod
+    async def connect(cls, host="localhost", port=DEFAULT_PORT, path=None, match_id=ANY_MATCH):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+
+        writer.write(JOIN.pack(MAGIC, match_id))
+        magic, match_id, player, w, h, tick_rate = WELCOME.unpack(await reader.readexactly(WELCOME.size))
+        if magic != MAGIC:
+            writer.close()
+            raise ConnectionError(f"unexpected reply {magic!r} from the game server")
+        if player == 0:
+            writer.close()
+            raise ConnectionError("no free seat on the game server")
+        return cls(reader, writer, match_id, player, w, h, tick_rate)
+
+    async def read_frame(self):
+        data = await self.reader.readexactly(STATE_FRAME_SIZE)
+        tick, game_over, score1, score2 = STATE_HEADER.unpack_from(data)
+        observation = np.frombuffer(data, dtype="<f4", offset=STATE_HEADER.size)
+        return tick, bool(game_over), (score1, score2), observation
+
+    def send_action(self, tick, action):
+        self.writer.write(ACTION.pack(tick, int(action)))
+
+    async def play(self, policy, frames=None):
+        # answers every state frame with the policy's action, returns the number of frames played
+        played = 0
+        while frames is None or played < frames:
+            try:
+                tick, game_over, scores, observation = await self.read_frame()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            self.send_action(tick, policy.act(observation.reshape(1, STATE_SIZE))[0])
+            played += 1
+        return played
+
+    def close(self):
+        self.writer.close()
+
+
+async def serve(args):
+    server = GameServer(args.matches, tick_rate=args.tick_rate, seed=args.seed, swept_collisions=args.swept)
+    await server.listen(args.host, args.port, args.unix)
+    logger.info("serving %d matches", len(server.matches))
+
+    ticker = asyncio.create_task(server.run())
+    while True:
+        await asyncio.sleep(5)
+        logger.info("%s", server.get_stats())
+
+async def play(args):
+    clients = [await GameClient.connect(args.host, args.port, args.unix) for _ in range(args.clients)]
+    rng = np.random.default_rng(args.seed)
+    frames = await asyncio.gather(*(client.play(RandomPolicy(rng), args.frames) for client in clients))
+    for client in clients:
+        client.close()
+    print(f"{len(clients)} clients played {sum(frames)} frames")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="listen on or connect to this unix socket instead of tcp")
+    parser.add_argument("--matches", type=int, default=DEFAULT_MATCHES)
+    parser.add_argument("--tick-rate", type=float, default=DEFAULT_TICK_RATE)
+    parser.add_argument("--swept", action="store_true", help="use swept collision detection for the ball")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--clients", type=int, help="connect this many random agents instead of serving")
+    parser.add_argument("--frames", type=int, help="frames each client plays before disconnecting")
+    args = parser.parse_args()
+
+    pong_log.configure()
+    if args.clients:
+        asyncio.run(play(args))
+    else:
+        asyncio.run(serve(args))
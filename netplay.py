@@ -0,0 +1,188 @@
+import socket
+import struct
+import argparse
+import pygame
+from pong_log import logger
+from agent import Direction
+from pong import Pong, PHYSICS_HZ, MAX_FRAME_TIME, SERVE_INPUT, DIRECTION_INPUT_MASK
+
+# both machines run the same deterministic game and only exchange inputs. A missing remote input is
+# predicted as the last one that arrived, and when the real one turns out different the game is
+# rolled back to a snapshot and simulated forward again
+INPUT_PACKET = struct.Struct("<IIB") # frames of the peer received so far, first frame sent, number of inputs
+MAX_PACKET_INPUTS = 32
+DEFAULT_INPUT_DELAY = 2 # frames between reading a key and using it, hides that much latency without rollback
+MAX_ROLLBACK = 12 # frames the local game may run ahead of the last confirmed remote input
+HISTORY = 64 # frames of inputs and snapshots kept, must be more than MAX_ROLLBACK + the input delay
+MAX_INPUT_DELAY = HISTORY - MAX_ROLLBACK - 1
+DEFAULT_PORT = 5556
+
+class NetPong(Pong):
+    # one side of a two machine game. local_player is 1 or 2, the peer plays the other paddle.
+    # both sides must use the same seed and step_hz
+    def __init__(self, player1_name, player2_name, local_player, local_address, peer_address,
+                 w=640, h=480, game_speed=60, step_hz=PHYSICS_HZ, seed=0, input_delay=DEFAULT_INPUT_DELAY,
+                 input_source=None):
+        # a longer delay would overwrite local inputs that are neither used nor confirmed yet
+        if not 0 <= input_delay <= MAX_INPUT_DELAY:
+            raise ValueError(f"input delay {input_delay} is outside 0 to {MAX_INPUT_DELAY} frames")
+        super().__init__(player1_name, player2_name, w, h, game_speed, step_hz, seed)
+        self.local_player = local_player
+        self.peer_address = peer_address
+        self.input_delay = input_delay
+        # scripted inputs for tests, called with the frame number instead of reading the keyboard
+        self.input_source = input_source
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(local_address)
+        self.socket.setblocking(False)
+
+        # frame is the next physics step to simulate. Inputs for the first input_delay frames are
+        # neutral on both sides, so they count as received already
+        self.frame = 0
+        self.local_inputs = bytearray(HISTORY)
+        self.remote_inputs = bytearray(HISTORY)
+        self.predicted_inputs = bytearray(HISTORY)
+        self.snapshots = [None] * HISTORY
+        self.local_frames = input_delay # local inputs known, frames below this
+        self.remote_frames = input_delay # remote inputs received, frames below this
+        self.peer_received = 0 # local inputs the peer has confirmed
+        self.rollbacks = 0
+        self.stalls = 0
+
+    def step_frame(self):
+        self.handle_events()
+        self.receive_inputs()
+
+        self.accumulator += min(self.clock.tick(self.game_speed) / 1000, MAX_FRAME_TIME) * PHYSICS_HZ
+        while self.accumulator >= self.dt:
+            if not self.advance():
+                # too far ahead of the peer, wait for its inputs
+                self.stalls += 1
+                self.accumulator = 0.0
+                break
+            self.accumulator -= self.dt
+
+        self.render_alpha = self.accumulator / self.dt
+        self.update_screen()
+
+        game_over = bool(self.player1.win or self.player2.win)
+        score = max(self.player1.current_score, self.player2.current_score) if game_over else 0
+        return game_over, score
+
+    def read_local_input(self):
+        if self.input_source is not None:
+            return self.input_source(self.local_frames)
+
+        # either key set moves the local paddle
+        keys_pressed = pygame.key.get_pressed()
+        local_input = self.read_keys(keys_pressed, pygame.K_w, pygame.K_s)
+        if local_input == Direction.neutral.value:
+            local_input = self.read_keys(keys_pressed, pygame.K_UP, pygame.K_DOWN)
+        if self.serve_pressed:
+            local_input |= SERVE_INPUT
+            self.serve_pressed = False
+        return local_input
+
+    def advance(self):
+        frame = self.frame
+        if frame - self.remote_frames >= MAX_ROLLBACK:
+            self.send_inputs()
+            return False
+
+        # the input read now is used input_delay frames later
+        self.local_inputs[self.local_frames % HISTORY] = self.read_local_input()
+        self.local_frames += 1
+        self.send_inputs()
+
+        self.simulate(frame)
+        self.frame = frame + 1
+        return True
+
+    def simulate(self, frame):
+        index = frame % HISTORY
+        if frame < self.remote_frames:
+            remote_input = self.remote_inputs[index]
+        else:
+            # hold the last direction the peer sent, but never guess a serve
+            remote_input = self.remote_inputs[(self.remote_frames - 1) % HISTORY] & DIRECTION_INPUT_MASK
+        self.predicted_inputs[index] = remote_input
+
+        self.snapshots[index] = self.snapshot()
+        if self.local_player == 1:
+            self.apply_inputs(self.local_inputs[index], remote_input)
+        else:
+            self.apply_inputs(remote_input, self.local_inputs[index])
+        self.step_physics()
+
+    def send_inputs(self):
+        # everything the peer has not confirmed yet, oldest first
+        first = self.peer_received
+        count = min(self.local_frames - first, MAX_PACKET_INPUTS)
+        inputs = bytes(self.local_inputs[frame % HISTORY] for frame in range(first, first + count))
+        try:
+            self.socket.sendto(INPUT_PACKET.pack(self.remote_frames, first, count) + inputs, self.peer_address)
+        except (BlockingIOError, ConnectionError):
+            pass
+
+    def receive_inputs(self):
+        rollback_frame = None
+        while True:
+            try:
+                packet = self.socket.recv(INPUT_PACKET.size + MAX_PACKET_INPUTS)
+            except (BlockingIOError, ConnectionError):
+                break
+            if len(packet) < INPUT_PACKET.size:
+                continue
+
+            peer_received, first, count = INPUT_PACKET.unpack_from(packet)
+            self.peer_received = max(self.peer_received, peer_received)
+            inputs = packet[INPUT_PACKET.size:INPUT_PACKET.size + count]
+
+            # inputs are taken in order, anything already received is skipped
+            for frame in range(self.remote_frames, first + len(inputs)):
+                if frame < first:
+                    break
+                remote_input = inputs[frame - first]
+                self.remote_inputs[frame % HISTORY] = remote_input
+                self.remote_frames = frame + 1
+                if frame < self.frame and remote_input != self.predicted_inputs[frame % HISTORY] and rollback_frame is None:
+                    rollback_frame = frame
+
+        if rollback_frame is not None:
+            self.rollback(rollback_frame)
+
+    def rollback(self, frame):
+        # go back to the first wrongly predicted frame and simulate up to the present again
+        self.rollbacks += 1
+        logger.debug("rolling back %d frames", self.frame - frame)
+        self.restore(self.snapshots[frame % HISTORY])
+        for resimulated in range(frame, self.frame):
+            self.simulate(resimulated)
+
+    def close(self):
+        self.socket.close()
+
+
+def parse_address(text):
+    host, port = text.rsplit(":", 1)
+    return host, int(port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--player", type=int, choices=(1, 2), required=True, help="the paddle played on this machine")
+    parser.add_argument("--listen", default=f"0.0.0.0:{DEFAULT_PORT}", help="local host:port")
+    parser.add_argument("--peer", required=True, help="host:port of the other machine")
+    parser.add_argument("--seed", type=int, default=0, help="must be the same on both machines")
+    parser.add_argument("--delay", type=int, default=DEFAULT_INPUT_DELAY,
+                        help=f"input delay in frames, at most {MAX_INPUT_DELAY}")
+    args = parser.parse_args()
+
+    player1_name = input("player 1 name: ")
+    player2_name = input("player 2 name: ")
+    game = NetPong(player1_name, player2_name, args.player, parse_address(args.listen), parse_address(args.peer),
+                   seed=args.seed, input_delay=args.delay)
+
+    while True:
+        game.step_frame()
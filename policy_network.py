@@ -0,0 +1,92 @@
+import numpy as np
+from agent import Direction, STATE_SIZE
+
+DEFAULT_HIDDEN_SIZES = (64, 64)
+DEFAULT_BATCH_SIZE = 256 # rows the activation buffers start with, they grow when needed
+
+class PolicyNetwork():
+    # small relu MLP from the STATE_SIZE observation to one score per Direction, numpy only.
+    # weights and activation buffers are allocated once and forward writes into them in place.
+    # follows the batched policy interface, act takes an (n, STATE_SIZE) matrix
+    def __init__(self, hidden_sizes=DEFAULT_HIDDEN_SIZES, epsilon=0.0, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.epsilon = epsilon
+        self.sizes = (STATE_SIZE,) + tuple(hidden_sizes) + (len(Direction),)
+
+        self.weights = []
+        self.biases = []
+        for n_in, n_out in zip(self.sizes[:-1], self.sizes[1:]):
+            # he initialization for the relu layers
+            self.weights.append((self.rng.standard_normal((n_in, n_out)) * np.sqrt(2 / n_in)).astype(np.float32))
+            self.biases.append(np.zeros(n_out, dtype=np.float32))
+
+        self.allocate_buffers(DEFAULT_BATCH_SIZE)
+
+    def allocate_buffers(self, batch_size):
+        self.batch_size = batch_size
+        self.activations = [np.empty((batch_size, size), dtype=np.float32) for size in self.sizes[1:]]
+
+    def forward(self, observations):
+        # returns a view into the last activation buffer, it is overwritten by the next call
+        n = len(observations)
+        if n > self.batch_size:
+            self.allocate_buffers(max(n, 2 * self.batch_size))
+
+        x = observations
+        last = len(self.weights) - 1
+        for layer, (weights, biases) in enumerate(zip(self.weights, self.biases)):
+            out = self.activations[layer][:n]
+            np.matmul(x, weights, out=out)
+            out += biases
+            if layer != last:
+                np.maximum(out, 0, out=out)
+            x = out
+        return x
+
+    def act(self, observations, epsilon=None):
+        if epsilon is None:
+            epsilon = self.epsilon
+
+        actions = self.forward(observations).argmax(axis=1)
+        if epsilon > 0:
+            explore = self.rng.random(len(actions)) < epsilon
+            actions[explore] = self.rng.integers(0, len(Direction), size=np.count_nonzero(explore))
+        return actions
+
+    def choose_direction(self, observation, epsilon=None):
+        return Direction(int(self.act(observation.reshape(1, STATE_SIZE), epsilon)[0]))
+
+    def save(self, path):
+        arrays = {}
+        for layer, (weights, biases) in enumerate(zip(self.weights, self.biases)):
+            arrays[f"weights_{layer}"] = weights
+            arrays[f"biases_{layer}"] = biases
+        np.savez(path, sizes=np.array(self.sizes), **arrays)
+
+    @classmethod
+    def load(cls, path, epsilon=0.0, seed=None):
+        with np.load(path) as arrays:
+            sizes = tuple(int(size) for size in arrays["sizes"])
+            if sizes[0] != STATE_SIZE or sizes[-1] != len(Direction):
+                raise ValueError(f"{path} has layer sizes {sizes}, expected {STATE_SIZE} inputs and {len(Direction)} outputs")
+
+            network = cls(sizes[1:-1], epsilon, seed)
+            for layer in range(len(network.weights)):
+                network.weights[layer][...] = arrays[f"weights_{layer}"]
+                network.biases[layer][...] = arrays[f"biases_{layer}"]
+        return network
+
+
+if __name__ == "__main__":
+    import time
+
+    network = PolicyNetwork(seed=0)
+    observations = np.random.default_rng(0).random((2048, STATE_SIZE), dtype=np.float32)
+
+    for batch in (1, 2, 2048):
+        calls = max(1, 20000 // batch)
+        start = time.perf_counter()
+        for _ in range(calls):
+            network.act(observations[:batch])
+        elapsed = time.perf_counter() - start
+        print(f"batch {batch:>5}: {calls * batch / elapsed:12.0f} decisions per second")
@@ -4,24 +4,33 @@ import numpy as np
 from enum import Enum
 import math
 from collections import namedtuple
+from text_cache import TextCache
+from pong_log import logger
+from agent import Direction
+from pong_sim import PHYSICS_HZ, DEFAULT_RESET_WAIT, PADDLE_SPEEDS
 
 BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 BLUE = (0, 0, 255)
 WHITE = (255, 255, 255)
 
-GAME_SPEED = 60 # frames per second
+GAME_SPEED = 60 # displayed frames per second
+MAX_FRAME_TIME = 0.25 # seconds, a longer stall is not caught up on
+REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED) # the window contents may be lost
 DEFAULT_PADDLE_SPEED = 6 # pixels
 MAX_BALL_SPEED_X = 10
 MAX_BALL_SPEED_Y = 20
 MAX_MAGNITUDE = np.sqrt(MAX_BALL_SPEED_X**2 + MAX_BALL_SPEED_Y**2)
-DEFAULT_RESET_WAIT = GAME_SPEED # frames
 MAX_MOMENTUM = 100 # must be divisible by 10. Can be left alone, just tweak the scaling
 MOMENTUM_STEPS = MAX_MOMENTUM / np.gcd(MAX_MOMENTUM, 10)
 MOMENTUM_SCALING = 0.5 # 1 means standard rate of momentum scaling
 
 WINNING_SCORE = 1
 
+# one input per player per physics step: a Direction value, plus SERVE_INPUT when space was pressed
+SERVE_INPUT = 4
+DIRECTION_INPUT_MASK = 3
+
 Point = namedtuple('Point', 'x, y')
 Speed_Vector = namedtuple('Speed_Vector', 'x, y')
 
@@ -44,6 +53,12 @@ class Player():
         self.current_score = 0
         self.win = 0
 
+    def snapshot(self):
+        return (self.current_score, self.win)
+
+    def restore(self, state):
+        self.current_score, self.win = state
+
 class Paddle():
     def __init__(self, global_center=Point(0, 0), w=0, h=0, color=WHITE, game_w=0, game_h=0):
         self.game_w = game_w
@@ -63,17 +78,24 @@ class Paddle():
     def set_speed(self, new_speed:Speed_Vector):
         self.speed = new_speed
 
-    def move_by_speed(self):
-        new_center = Point(self.center.x + self.speed.x, self.center.y + self.speed.y)
+    def snapshot(self):
+        # points and speeds are immutable tuples, so they can be kept as they are
+        return (self.center, self.speed, self.momentum, self.on_ceiling, self.on_floor)
+
+    def restore(self, state):
+        self.center, self.speed, self.momentum, self.on_ceiling, self.on_floor = state
+
+    def move_by_speed(self, dt=1):
+        new_center = Point(self.center.x + self.speed.x * dt, self.center.y + self.speed.y * dt)
         if new_center.y - self.h/2 < 0 or new_center.y + self.h/2 > self.game_h: # screen edges
             pass
         
         else:
-            self.increment_momentum()
+            self.increment_momentum(dt)
 
             self.center = new_center
         
-    def increment_momentum(self):
+    def increment_momentum(self, dt=1):
         if self.speed.y == 0:
             self.momentum = 0
             return
@@ -84,10 +106,11 @@ class Paddle():
             self.momentum = 0
 
         if abs(self.momentum) < MAX_MOMENTUM:
-            self.momentum += self.speed.y * MOMENTUM_SCALING
+            self.momentum += self.speed.y * MOMENTUM_SCALING * dt
 
 class Ball():
-    def __init__(self, global_center: Point, w, h, color:tuple, game_w, game_h):
+    def __init__(self, global_center: Point, w, h, color:tuple, game_w, game_h, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.game_w = game_w
         self.game_h = game_h
         
@@ -148,11 +171,17 @@ class Ball():
     def move_to_position(self, new_center:Point):
         self.center = new_center
 
-    def move_by_speed(self):
-        new_center = Point(self.center.x + self.speed.x, self.center.y + self.speed.y)
+    def snapshot(self):
+        return (self.center, self.speed, self.in_front_paddle1, self.in_front_paddle2, self.reset_wait)
+
+    def restore(self, state):
+        self.center, self.speed, self.in_front_paddle1, self.in_front_paddle2, self.reset_wait = state
+
+    def move_by_speed(self, dt=1):
+        new_center = Point(self.center.x + self.speed.x * dt, self.center.y + self.speed.y * dt)
         self.center = new_center
 
-    def reset(self):
+    def reset(self, dt=1):
         if self.center.x - self.w/2 < 0 or self.center.x + self.w/2 > self.game_w:
             # ball has been scored
             no_speed = Speed_Vector(0, 0)
@@ -162,25 +191,24 @@ class Ball():
             self.reset_wait = DEFAULT_RESET_WAIT
 
         elif self.reset_wait > 0:
-            self.reset_wait -= 1
+            self.reset_wait = max(self.reset_wait - dt, 0)
         elif self.reset_wait == 0:
             self.reset_wait -= 1
             self.serve()
     
     def serve(self):
         # serve the ball
-        print("serving!")
         positive_range = list(range(2, 4))
         negative_range = list(range(-3, -1))
         speed_possibilities = positive_range + negative_range
-        start_speed_x = np.random.choice(speed_possibilities)
+        start_speed_x = self.rng.choice(speed_possibilities)
         start_speed = Speed_Vector(start_speed_x, 0)
         self.change_speed(start_speed)
-        print(self.speed)
+        logger.debug("serving: %s", self.speed)
     
     def get_hit(self, paddle:Paddle):
         # generate random x speed increase
-        x_speed_scale = np.random.randint(100, 150) / 100
+        x_speed_scale = self.rng.integers(100, 150) / 100
 
         # add y speed based on momentum and current ball x speed
         max_possible_y_speed = abs(self.speed.x) * (MAX_MOMENTUM / 100)
@@ -211,9 +239,21 @@ class Ball():
         self.change_speed(new_speed)
 
 class Pong:
-    def __init__(self, player1_name, player2_name, w=640, h=480):
+    def __init__(self, player1_name, player2_name, w=640, h=480, game_speed=GAME_SPEED, step_hz=PHYSICS_HZ, seed=None):
         self.w = w
         self.h = h
+        # all randomness comes from this stream, two games with the same seed and inputs play out the same
+        self.rng = np.random.default_rng(seed)
+        self.serve_pressed = False
+
+        # the display rate and the physics step size are independent, the game plays
+        # PHYSICS_HZ ticks per second of wall clock time either way
+        self.game_speed = game_speed
+        self.dt = PHYSICS_HZ / step_hz
+        # ticks of wall clock time not simulated yet, and how far the display is between the last two steps
+        self.accumulator = 0.0
+        self.render_alpha = 1.0
+        self.previous_centers = []
 
         self.player1_name = player1_name
         self.player2_name = player2_name
@@ -228,6 +268,14 @@ class Pong:
 
         pygame.font.init()
         self.font = pygame.font.Font('./Lato-Black.ttf', 30)
+        self.text_cache = TextCache(self.font)
+        # score surfaces are only looked up again when a score changes
+        self.rendered_scores = None
+        self.score_surfaces = None
+
+        # rects drawn in the last update_screen, cleared and redrawn next time
+        self.dirty_rects = []
+        self.full_redraw = True
         self.initialize_players()
 
         self.first_serve = False
@@ -252,20 +300,54 @@ class Pong:
         # balls
         self.balls = []
         ball_starting_position = Point(self.w/2, self.h/2)
-        self.ball = Ball(ball_starting_position, 10, 10, WHITE, self.w, self.h)
+        self.ball = Ball(ball_starting_position, 10, 10, WHITE, self.w, self.h, self.rng)
         self.balls.append(self.ball)
 
+    def snapshot(self):
+        # everything a physics step reads or writes, restore() puts it back exactly
+        return (self.player1.snapshot(), self.player2.snapshot(),
+                self.player1.paddle.snapshot(), self.player2.paddle.snapshot(), self.ball.snapshot(),
+                bool(self.paddles), bool(self.balls), self.first_serve, self.rng.bit_generator.state)
+
+    def restore(self, state):
+        (player1, player2, paddle1, paddle2, ball,
+         paddles_shown, balls_shown, self.first_serve, self.rng.bit_generator.state) = state
+        self.player1.restore(player1)
+        self.player2.restore(player2)
+        self.player1.paddle.restore(paddle1)
+        self.player2.paddle.restore(paddle2)
+        self.ball.restore(ball)
+        self.paddles = [self.player1.paddle, self.player2.paddle] if paddles_shown else []
+        self.balls = [self.ball] if balls_shown else []
+
     def step_frame(self):
         score = 0
         game_over = False
 
         self.user_input()
 
+        # as many fixed steps as the wall clock moved on, then draw in between the last two
+        self.accumulator += min(self.clock.tick(self.game_speed) / 1000, MAX_FRAME_TIME) * PHYSICS_HZ
+        while self.accumulator >= self.dt:
+            game_over, score = self.step_physics()
+            self.accumulator -= self.dt
+
+        self.render_alpha = self.accumulator / self.dt
+        self.update_screen()
+
+        return game_over, score
+
+    def step_physics(self):
+        score = 0
+        game_over = False
+
+        self.save_render_centers()
+
         self.check_collisions()
 
         if self.first_serve == True:
             for ball in self.balls:
-                ball.reset()
+                ball.reset(self.dt)
 
         self.move_gameobjects()
 
@@ -277,12 +359,19 @@ class Pong:
                 self.balls.clear()
                 self.paddles.clear()
 
-        self.update_screen()
-        self.clock.tick(GAME_SPEED)
-
         return game_over, score
     
     def user_input(self):
+        self.handle_events()
+        keys_pressed = pygame.key.get_pressed()
+        input1 = self.read_keys(keys_pressed, pygame.K_w, pygame.K_s)
+        input2 = self.read_keys(keys_pressed, pygame.K_UP, pygame.K_DOWN)
+        if self.serve_pressed:
+            input1 |= SERVE_INPUT
+            self.serve_pressed = False
+        self.apply_inputs(input1, input2)
+
+    def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -290,32 +379,28 @@ class Pong:
 
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
-                    if self.first_serve == False:
-                        self.first_serve = True
-                    elif self.first_serve == True & (self.player1.win or self.player2.win):
-                        self.restart()
-
-            keys_pressed = pygame.key.get_pressed()
-            # left player
-            if keys_pressed[pygame.K_w]:
-                up_speed = Speed_Vector(0, -DEFAULT_PADDLE_SPEED)
-                self.player1.paddle.set_speed(up_speed)
-            elif keys_pressed[pygame.K_s]:
-                down_speed = Speed_Vector(0, DEFAULT_PADDLE_SPEED)
-                self.player1.paddle.set_speed(down_speed)
-            else:
-                no_speed = Speed_Vector(0, 0)
-                self.player1.paddle.set_speed(no_speed)
-            # right player
-            if keys_pressed[pygame.K_UP]:
-                up_speed = Speed_Vector(0, -DEFAULT_PADDLE_SPEED)
-                self.player2.paddle.set_speed(up_speed)
-            elif keys_pressed[pygame.K_DOWN]:
-                down_speed = Speed_Vector(0, DEFAULT_PADDLE_SPEED)
-                self.player2.paddle.set_speed(down_speed)
-            else:
-                no_speed = Speed_Vector(0, 0)
-                self.player2.paddle.set_speed(no_speed)
+                    self.serve_pressed = True
+
+            if event.type in REDRAW_EVENTS:
+                self.full_redraw = True
+
+    def read_keys(self, keys_pressed, up_key, down_key):
+        if keys_pressed[up_key]:
+            return Direction.up.value
+        elif keys_pressed[down_key]:
+            return Direction.down.value
+        return Direction.neutral.value
+
+    def apply_inputs(self, input1, input2):
+        # everything the players do goes through here, so replaying the same inputs replays the game
+        if (input1 | input2) & SERVE_INPUT:
+            if self.first_serve == False:
+                self.first_serve = True
+            elif self.first_serve == True & (self.player1.win or self.player2.win):
+                self.restart()
+
+        self.player1.paddle.set_speed(Speed_Vector(0, PADDLE_SPEEDS[input1 & DIRECTION_INPUT_MASK]))
+        self.player2.paddle.set_speed(Speed_Vector(0, PADDLE_SPEEDS[input2 & DIRECTION_INPUT_MASK]))
 
     def check_collisions(self):
         # ball with ceiling or floor
@@ -359,20 +444,18 @@ class Pong:
                 close_1 = False
                 
             if (ball.center.x - ball.w/2 < self.player1.paddle.center.x + self.player1.paddle.w/2) & ball.in_front_paddle1 & close_1:
-                print("hitting paddle 1")
                 ball.get_hit(self.player1.paddle)
-                print(ball.speed)
+                logger.debug("hitting paddle 1: %s", ball.speed)
 
             close_2 = True
             if (ball.center.x + ball.w/2 > self.player2.paddle.center.x + self.player2.paddle.w/2):
                 close_2 = False
             if (ball.center.x + ball.w/2 > self.player2.paddle.center.x - self.player2.paddle.w/2) & ball.in_front_paddle2 & close_2:
-                print("hitting paddle 2")
                 ball.get_hit(self.player2.paddle)
-                print(ball.speed)
+                logger.debug("hitting paddle 2: %s", ball.speed)
         
     def get_random_speed_components(self):
-        speed_x_rand = np.random.randint(100, 150) / 100
+        speed_x_rand = self.rng.integers(100, 150) / 100
         
         # fix this, we don't like the gap
         negative_speeds = list(range(-105, -99))
@@ -380,22 +463,43 @@ class Pong:
 
         total_speed_possibilities = negative_speeds + positive_speeds
 
-        speed_y_rand = np.random.choice(total_speed_possibilities) / 100
+        speed_y_rand = self.rng.choice(total_speed_possibilities) / 100
 
         return speed_x_rand, speed_y_rand
 
     def move_gameobjects(self):
         # move paddles
         for paddle in self.paddles:
-            paddle.move_by_speed()
+            paddle.move_by_speed(self.dt)
         
         # move balls
         for ball in self.balls:
-            ball.move_by_speed()
+            ball.move_by_speed(self.dt)
 
-    def render_paddles(self):
+    def save_render_centers(self):
+        previous_centers = self.previous_centers
+        previous_centers.clear()
         for paddle in self.paddles:
-            pygame.draw.rect(self.display, WHITE, pygame.Rect(paddle.center.x - paddle.w/2, paddle.center.y - paddle.h/2, paddle.w, paddle.h))
+            previous_centers.append(paddle.center)
+        for ball in self.balls:
+            previous_centers.append(ball.center)
+
+    def get_render_center(self, index, center):
+        # paddles come first, then balls, in the order save_render_centers stored them
+        alpha = self.render_alpha
+        if alpha >= 1 or index >= len(self.previous_centers):
+            return center.x, center.y
+
+        previous_x, previous_y = self.previous_centers[index]
+        if abs(center.x - previous_x) > self.w/4:
+            # the ball was put back in the middle, don't slide it across the screen
+            return center.x, center.y
+        return previous_x + (center.x - previous_x) * alpha, previous_y + (center.y - previous_y) * alpha
+
+    def render_paddles(self):
+        for index, paddle in enumerate(self.paddles):
+            x, y = self.get_render_center(index, paddle.center)
+            self.dirty_rects.append(pygame.draw.rect(self.display, WHITE, pygame.Rect(x - paddle.w/2, y - paddle.h/2, paddle.w, paddle.h)))
             normalization_factor = 100 / MAX_MOMENTUM
             momentum_bar_size = (2 * abs(paddle.momentum) / 5) * normalization_factor
 
@@ -403,34 +507,46 @@ class Pong:
             if paddle.momentum < 0:
                 negative_momentum_displacement = momentum_bar_size 
 
-            pygame.draw.rect(self.display, paddle.color, pygame.Rect(paddle.center.x, paddle.center.y - negative_momentum_displacement, 2, momentum_bar_size))
+            self.dirty_rects.append(pygame.draw.rect(self.display, paddle.color, pygame.Rect(x, y - negative_momentum_displacement, 2, momentum_bar_size)))
 
     def render_balls(self):
-        for ball in self.balls:
-            pygame.draw.rect(self.display, self.ball.color, 
-                            pygame.Rect(ball.center.x - ball.w/2, ball.center.y - ball.h/2, 
-                                        ball.w, ball.h))
+        n_paddles = len(self.paddles)
+        for index, ball in enumerate(self.balls):
+            x, y = self.get_render_center(n_paddles + index, ball.center)
+            self.dirty_rects.append(pygame.draw.rect(self.display, self.ball.color, 
+                                                     pygame.Rect(x - ball.w/2, y - ball.h/2, 
+                                                                 ball.w, ball.h)))
     
     def render_scores(self):
-        player1_score_surface = self.font.render(f"{self.player1.name}: " + str(self.player1.current_score), False, WHITE)
-        player2_score_surface = self.font.render(f"{self.player2.name}: " + str(self.player2.current_score), False, WHITE)
-        self.display.blit(player1_score_surface, (self.w/2 - player1_score_surface.get_width()/2, 
-                                                  self.h - player1_score_surface.get_height() -
-                                                  player2_score_surface.get_height()))
-        self.display.blit(player2_score_surface, (self.w/2 - player2_score_surface.get_width()/2, 
-                                                  self.h - player2_score_surface.get_height()))
+        scores = (self.player1.current_score, self.player2.current_score)
+        if scores != self.rendered_scores:
+            self.score_surfaces = (self.text_cache.render(f"{self.player1.name}: " + str(self.player1.current_score), WHITE),
+                                   self.text_cache.render(f"{self.player2.name}: " + str(self.player2.current_score), WHITE))
+            self.rendered_scores = scores
+        player1_score_surface, player2_score_surface = self.score_surfaces
+        self.dirty_rects.append(self.display.blit(player1_score_surface, (self.w/2 - player1_score_surface.get_width()/2, 
+                                                                          self.h - player1_score_surface.get_height() -
+                                                                          player2_score_surface.get_height())))
+        self.dirty_rects.append(self.display.blit(player2_score_surface, (self.w/2 - player2_score_surface.get_width()/2, 
+                                                                          self.h - player2_score_surface.get_height())))
     
     def render_win(self):
         for player in self.players:
             if player.win:
-                text_surface = self.font.render(player.name + " wins!", False, WHITE)
-                self.display.blit(text_surface, (self.w/2 - text_surface.get_width()/2, self.h/2 - text_surface.get_height()/2))
+                text_surface = self.text_cache.render(player.name + " wins!", WHITE)
+                self.dirty_rects.append(self.display.blit(text_surface, (self.w/2 - text_surface.get_width()/2, self.h/2 - text_surface.get_height()/2)))
 
     def update_screen(self):
-        # Clear the screen
-        self.display.fill(BLACK)
+        # only the areas drawn last frame and this frame change, everything else stays black
+        previous_rects = self.dirty_rects
+        self.dirty_rects = []
+
+        if self.full_redraw:
+            self.display.fill(BLACK)
+        else:
+            for rect in previous_rects:
+                self.display.fill(BLACK, rect)
 
-        
         if (self.player1.win == True) or (self.player2.win == True):
             self.render_win()
         else:
@@ -440,7 +556,11 @@ class Pong:
             self.render_scores()
 
         # Update the display
-        pygame.display.update()
+        if self.full_redraw:
+            pygame.display.update()
+            self.full_redraw = False
+        else:
+            pygame.display.update(previous_rects + self.dirty_rects)
 
     def restart(self):
         for player in self.players:
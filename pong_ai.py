@@ -3,227 +3,52 @@ import os
 import numpy as np
 from enum import Enum
 import math
-from collections import namedtuple
-from agent import Agent, Direction, GameStateParameters, State
-
-# TODO: normalize state
-
-BLACK = (0, 0, 0)
-RED = (255, 0, 0)
-BLUE = (0, 0, 255)
-WHITE = (255, 255, 255)
-
-GAME_SPEED = 1 # frames per second
-DEFAULT_PADDLE_SPEED = 6 # pixels
-MAX_BALL_SPEED_X = 10
-MAX_BALL_SPEED_Y = 20
-MAX_MAGNITUDE = np.sqrt(MAX_BALL_SPEED_X**2 + MAX_BALL_SPEED_Y**2)
-DEFAULT_RESET_WAIT = GAME_SPEED # frames
-MAX_MOMENTUM = 100 # must be divisible by 10. Can be left alone, just tweak the scaling
-MOMENTUM_STEPS = MAX_MOMENTUM / np.gcd(MAX_MOMENTUM, 10)
-MOMENTUM_SCALING = 0.5 # 1 means standard rate of momentum scaling
-
-WINNING_SCORE = 1
-
-Point = namedtuple('Point', 'x, y')
-Speed_Vector = namedtuple('Speed_Vector', 'x, y')
-
-class Player():
-    def __init__(self, name):
-        self.name = name
-        self.current_score = 0
-        self.win = False
-        self.paddle = Paddle(name)
-        self.agent = Agent()
-
-    def score_points(self, points):
-        self.current_score += points
-
-    def check_win(self):
-        if self.current_score >= WINNING_SCORE:
-            self.win = True
-            return True
-        
-    def reset(self):
-        self.current_score = 0
-        self.win = 0
-
-class Paddle():
-    def __init__(self, global_center=Point(0, 0), w=0, h=0, color=WHITE, game_w=0, game_h=0):
-        self.game_w = game_w
-        self.game_h = game_h
-        
-        self.w = w
-        self.h = h
-        self.center = global_center
-        self.speed = DEFAULT_PADDLE_SPEED
-        self.color = color
-        self.speed = Speed_Vector(0, 0)
-        self.momentum = 0
-        self.momentum_steps = MOMENTUM_STEPS
-        self.on_ceiling = False
-        self.on_floor = False
-    
-    def set_speed(self, new_speed:Speed_Vector):
-        self.speed = new_speed
-
-    def move_by_speed(self):
-        new_center = Point(self.center.x + self.speed.x, self.center.y + self.speed.y)
-        if new_center.y - self.h/2 < 0 or new_center.y + self.h/2 > self.game_h: # screen edges
-            pass
-        
-        else:
-            self.increment_momentum()
-
-            self.center = new_center
-        
-    def increment_momentum(self):
-        if self.speed.y == 0:
-            self.momentum = 0
-            return
-
-        next_momentum = self.momentum + self.speed.y
-
-        if (abs(self.momentum) == MAX_MOMENTUM) & (abs(next_momentum) < abs(self.momentum)): # direction change
-            self.momentum = 0
-
-        if abs(self.momentum) < MAX_MOMENTUM:
-            self.momentum += self.speed.y * MOMENTUM_SCALING
-
-class Ball():
-    def __init__(self, global_center: Point, w, h, color:tuple, game_w, game_h):
-        self.game_w = game_w
-        self.game_h = game_h
-        
-        self.center = global_center
-        self.w = w
-        self.h = h
-        self.color = color
-        self.speed = Speed_Vector(0, 0)
-        self.in_front_paddle1 = False
-        self.in_front_paddle2 = False
-        self.reset_wait = 0
-
-    def clamp_speed(self):
-        if self.speed.x > MAX_BALL_SPEED_X:
-            new_speed = Speed_Vector(MAX_BALL_SPEED_X, self.speed.y)
-            self.speed = new_speed
-        elif self.speed.x < -MAX_BALL_SPEED_X:
-            new_speed = Speed_Vector(-MAX_BALL_SPEED_X, self.speed.y)
-            self.speed = new_speed
-
-        if self.speed.y > MAX_BALL_SPEED_Y:
-            new_speed = Speed_Vector(self.speed.x, MAX_BALL_SPEED_Y)
-            self.speed = new_speed
-        elif self.speed.y < -MAX_BALL_SPEED_Y:
-            new_speed = Speed_Vector(self.speed.x, -MAX_BALL_SPEED_Y)
-            self.speed = new_speed
-
-        if self.speed.x == 0:
-            return
-        
-        magnitude = np.sqrt(self.speed.x**2 + self.speed.y ** 2)
-        angle = np.tan(self.speed.y / self.speed.x)
-        if magnitude > MAX_MAGNITUDE:
-            new_speed_x = MAX_MAGNITUDE * np.cos(angle)
-            new_speed_y = MAX_MAGNITUDE * np.sin(angle)
-            new_speed = Speed_Vector(new_speed_x, new_speed_y)
-            self.speed = new_speed
-    
-    def change_speed(self, new_speed:Speed_Vector):
-        self.speed = new_speed
-
-        self.clamp_speed()
-
-    def add_speed(self, x_add, y_add):
-        new_speed_x = self.speed.x + x_add
-        new_speed_y = self.speed.y + y_add
-        new_speed = Speed_Vector(new_speed_x, new_speed_y)
+import time
+import argparse
+import pong_log
+from pong_log import logger
+from recording import EpisodeRecorder
+from profiler import DISPLAY_TRACK
+from text_cache import TextCache
+from pong_sim import (BLACK, RED, BLUE, WHITE, DEFAULT_PADDLE_SPEED, MAX_BALL_SPEED_X, MAX_BALL_SPEED_Y,
+                      MAX_MAGNITUDE, DEFAULT_RESET_WAIT, MAX_MOMENTUM, MOMENTUM_STEPS, MOMENTUM_SCALING,
+                      WINNING_SCORE, PHYSICS_HZ, Point, Speed_Vector, Player, Paddle, Ball, Pong_Sim)
+
+# the constants and game objects used to be defined here, they are still importable from this module
+__all__ = ["Pong_AI", "GAME_SPEED", "DEFAULT_RENDER_EVERY", "MAX_FRAME_TIME", "REDRAW_EVENTS",
+           "BLACK", "RED", "BLUE", "WHITE", "DEFAULT_PADDLE_SPEED", "MAX_BALL_SPEED_X", "MAX_BALL_SPEED_Y",
+           "MAX_MAGNITUDE", "DEFAULT_RESET_WAIT", "MAX_MOMENTUM", "MOMENTUM_STEPS", "MOMENTUM_SCALING",
+           "WINNING_SCORE", "Point", "Speed_Vector", "Player", "Paddle", "Ball"]
+
+GAME_SPEED = 60 # displayed frames per second, 0 means uncapped with one physics step per frame
+DEFAULT_RENDER_EVERY = 1 # frames, 0 means never render. Only used when uncapped
+MAX_FRAME_TIME = 0.25 # seconds, a longer stall is not caught up on
+REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED) # the window contents may be lost
+
+class Pong_AI(Pong_Sim):
+    def __init__(self, player1_name, player2_name, w=640, h=480, game_speed=GAME_SPEED, render_every=DEFAULT_RENDER_EVERY, seed=None, swept_collisions=False, step_hz=PHYSICS_HZ, action_repeat=1):
+        # the physics always runs PHYSICS_HZ ticks per second of game time, step_hz only sets
+        # how finely those ticks are cut into steps
+        super().__init__(player1_name, player2_name, w, h, first_serve=False, seed=seed, swept_collisions=swept_collisions,
+                         dt=PHYSICS_HZ / step_hz, action_repeat=action_repeat)
+
+        self.game_speed = game_speed
+        self.render_every = render_every
+
+        # ticks of wall clock time not simulated yet, and how far the display is between the last two steps
+        self.accumulator = 0.0
+        self.render_alpha = 1.0
+        self.previous_centers = []
+
+        # chrome trace written on quit when profiling is enabled
+        self.profile_path = None
+        self.display_frames = 0
+
+        # throughput tracking
+        self.steps_per_second = 0
+        self.sps_window_start = time.perf_counter()
+        self.sps_window_frames = 0
 
-        self.change_speed(new_speed)
-
-    def scale_speed(self, x_mult, y_mult):
-        new_speed_x = self.speed.x * x_mult
-        new_speed_y = self.speed.y * y_mult
-        new_speed = Speed_Vector(new_speed_x, new_speed_y)
-
-        self.change_speed(new_speed)
-    
-    def move_to_position(self, new_center:Point):
-        self.center = new_center
-
-    def move_by_speed(self):
-        new_center = Point(self.center.x + self.speed.x, self.center.y + self.speed.y)
-        self.center = new_center
-
-    def reset(self):
-        if self.center.x - self.w/2 < 0 or self.center.x + self.w/2 > self.game_w:
-            # ball has been scored
-            no_speed = Speed_Vector(0, 0)
-            self.change_speed(no_speed)
-            screen_center = Point(self.game_w/2, self.game_h/2)
-            self.move_to_position(screen_center)
-            self.reset_wait = DEFAULT_RESET_WAIT
-
-        elif self.reset_wait > 0:
-            self.reset_wait -= 1
-        elif self.reset_wait == 0:
-            self.reset_wait -= 1
-            self.serve()
-    
-    def serve(self):
-        # serve the ball
-        print("serving!")
-        positive_range = list(range(2, 4))
-        negative_range = list(range(-3, -1))
-        speed_possibilities = positive_range + negative_range
-        start_speed_x = np.random.choice(speed_possibilities)
-        start_speed = Speed_Vector(start_speed_x, 0)
-        self.change_speed(start_speed)
-        print(self.speed)
-    
-    def get_hit(self, paddle:Paddle):
-        # generate random x speed increase
-        x_speed_scale = np.random.randint(100, 150) / 100
-
-        # add y speed based on momentum and current ball x speed
-        max_possible_y_speed = abs(self.speed.x) * (MAX_MOMENTUM / 100)
-        min_possible_y_speed = 0
-
-        # generate possible y speeds
-        steps = paddle.momentum_steps
-        step_size = (max_possible_y_speed - min_possible_y_speed)/steps
-        positive_speed_possibilities = np.arange(min_possible_y_speed, max_possible_y_speed, step_size)
-        negative_speed_possibilities = -1 * positive_speed_possibilities
-
-        # select a speed based on paddle momentum
-        choice = None
-        momentum_magnitude = abs(paddle.momentum)
-        if paddle.momentum > 0:
-            #y_speed_increment = np.random.choice(positive_speed_possibilities)
-            choice = int(momentum_magnitude/len(positive_speed_possibilities)) - 1
-            y_speed_increment = positive_speed_possibilities[choice]
-        elif paddle.momentum < 0:
-            #y_speed_increment = np.random.choice(negative_speed_possibilities)
-            choice = int(momentum_magnitude/len(negative_speed_possibilities)) - 1
-            y_speed_increment = negative_speed_possibilities[choice]
-        elif paddle.momentum == 0:
-            choice = None
-            y_speed_increment = 0
-        
-        new_speed = Speed_Vector(-1 * (self.speed.x * x_speed_scale), self.speed.y + y_speed_increment)
-        self.change_speed(new_speed)
-
-class Pong_AI:
-    def __init__(self, player1_name, player2_name, w=640, h=480):
-        self.game_state_parameters = GameStateParameters(w, h, DEFAULT_PADDLE_SPEED,
-                                                         MAX_MOMENTUM, MAX_BALL_SPEED_X, 
-                                                         MAX_BALL_SPEED_Y)
-        self.w = w
-        self.h = h
-
-        self.player1_name = player1_name
-        self.player2_name = player2_name
         # initialize the display
         self.display = pygame.display.set_mode((self.w, self.h))
         pygame.display.set_caption("pong")
@@ -235,115 +60,125 @@ class Pong_AI:
 
         pygame.font.init()
         self.font = pygame.font.Font('./Lato-Black.ttf', 30)
-        self.initialize_players()
-
-        self.first_serve = False
-        self.initialize_gameobjects()
-
-    def initialize_players(self):
-        self.player1 = Player(self.player1_name)
-        self.player2 = Player(self.player2_name)
-        self.player1.agent.normalizedState.set_parameters(self.game_state_parameters)
-        self.player2.agent.normalizedState.set_parameters(self.game_state_parameters)
-        self.players = [self.player1, self.player2]
-
-    def send_states(self):
-        player1_state = State(self.game_state_parameters, 
-                              self.player1.paddle.center.y, self.player1.paddle.speed.y, self.player1.paddle.momentum, 
-                              self.player2.paddle.center.y, self.player2.paddle.speed.y, self.player2.paddle.momentum,
-                              self.ball.center.x, self.ball.center.y, 
-                              self.ball.speed.x, self.ball.speed.y)
-        
-        player2_state = State(self.game_state_parameters, 
-                              self.player2.paddle.center.y, self.player2.paddle.speed.y, self.player2.paddle.momentum, 
-                              self.player1.paddle.center.y, self.player1.paddle.speed.y, self.player1.paddle.momentum,
-                              self.ball.center.x, self.ball.center.y, 
-                              self.ball.speed.x, self.ball.speed.y)
-        
-        #player1_state.normalize_state()
-        #player2_state.normalize_state()
-
-        print("sending state 1:")
-        player1_state.print_state()
-        self.player1.agent.set_normalized_state(player1_state)
-
-        print("sending state 2")
-        #player2_state.print_state()
-        self.player2.agent.set_normalized_state(player2_state)
-
-    def initialize_gameobjects(self):
-        # paddles
-        self.paddles = []
-        paddle1_starting_location = Point(20, self.h/2)
-        self.player1.paddle = Paddle(paddle1_starting_location, 10, 100, BLUE, self.w, self.h)
-        self.paddles.append(self.player1.paddle)
-
-        paddle2_starting_location = Point(self.w-20, self.h/2)
-        self.player2.paddle = Paddle(paddle2_starting_location, 10, 100, RED, self.w, self.h)
-        self.paddles.append(self.player2.paddle)
-
-        # balls
-        self.balls = []
-        ball_starting_position = Point(self.w/2, self.h/2)
-        self.ball = Ball(ball_starting_position, 10, 10, WHITE, self.w, self.h)
-        self.balls.append(self.ball)
+        self.text_cache = TextCache(self.font)
+        # score surfaces are only looked up again when a score changes
+        self.rendered_scores = None
+        self.score_surfaces = None
+
+        # rects drawn in the last update_screen, cleared and redrawn next time
+        self.dirty_rects = []
+        self.full_redraw = True
 
     def step_frame(self):
-        score = 0
-        game_over = False
+        # when profiling, every physics step is recorded as a frame and the display work after
+        # the steps as a frame on the display track
+        if self.game_speed == 0:
+            game_over, score = self.step_fixed()
+            self.begin_display_profile_frame()
+            self.render()
+            self.handle_events()
+            self.tick_clock()
+            return game_over, score
+
+        # real time: as many fixed steps as the wall clock moved on by the end of the last frame,
+        # then draw in between the last two
+        game_over, score = self.game_over, self.score
+        while self.accumulator >= self.dt:
+            game_over, score = self.step_fixed()
+            self.accumulator -= self.dt
+
+        self.begin_display_profile_frame()
+        self.render_alpha = self.accumulator / self.dt
+        self.update_screen()
+        self.render_alpha = 1.0
+        self.handle_events()
+        self.accumulator += min(self.tick_clock() / 1000, MAX_FRAME_TIME) * PHYSICS_HZ
 
-        self.agent_input()
+        return game_over, score
 
-        self.check_collisions()
+    def begin_display_profile_frame(self):
+        self.display_frames += 1
+        if self.profiler is not None:
+            self.profiler.begin_frame(self.display_frames, DISPLAY_TRACK)
 
-        if self.first_serve == True:
-            for ball in self.balls:
-                ball.reset()
+    def step_fixed(self):
+        self.begin_profile_frame()
+        self.save_render_centers()
 
-        self.move_gameobjects()
+        game_over, score = self.step_with_repeat()
 
-        for player in self.players:
-            win = player.check_win()
-            if win:
-                game_over = True
-                score = player.current_score
-                self.balls.clear()
-                self.paddles.clear()
+        self.update_steps_per_second()
 
-        self.update_screen()
-        self.clock.tick(GAME_SPEED)
-
-        self.send_states()
+        if self.recorder is not None:
+            self.recorder.record(self)
 
         return game_over, score
-    
-    def agent_input(self):
-        # left player
-        self.player1.agent.play_random_move()
-        if self.player1.agent.direction == Direction.neutral:
-            no_speed = Speed_Vector(0, 0)
-            self.player1.paddle.set_speed(no_speed)
-        elif self.player1.agent.direction == Direction.up:
-            up_speed = Speed_Vector(0, -DEFAULT_PADDLE_SPEED)
-            self.player1.paddle.set_speed(up_speed)
-        elif self.player1.agent.direction == Direction.down:
-            down_speed = Speed_Vector(0, DEFAULT_PADDLE_SPEED)
-            self.player1.paddle.set_speed(down_speed)
-
-        # right player
-        self.player2.agent.play_random_move()
-        if self.player2.agent.direction == Direction.neutral:
-            no_speed = Speed_Vector(0, 0)
-            self.player2.paddle.set_speed(no_speed)
-        elif self.player2.agent.direction == Direction.up:
-            up_speed = Speed_Vector(0, -DEFAULT_PADDLE_SPEED)
-            self.player2.paddle.set_speed(up_speed)
-        elif self.player2.agent.direction == Direction.down:
-            down_speed = Speed_Vector(0, DEFAULT_PADDLE_SPEED)
-            self.player2.paddle.set_speed(down_speed)
 
+    def get_stages(self):
+        return (("agent_input", self.agent_input),
+                ("handle_events", self.handle_events),
+                ("check_collisions", self.check_collisions),
+                ("reset_balls", self.reset_balls),
+                ("move_gameobjects", self.move_gameobjects),
+                ("check_wins", self.check_wins),
+                ("update_screen", self.update_screen),
+                ("clock_tick", self.tick_clock),
+                ("send_states", self.send_states),
+                ("update_steps_per_second", self.update_steps_per_second))
+
+    def render(self):
+        if self.render_every > 0 and self.frame_count % self.render_every == 0:
+            self.update_screen()
+
+    def tick_clock(self):
+        # milliseconds since the last tick
+        return self.clock.tick(self.game_speed)
+
+    def restore_objects(self, buffer):
+        super().restore_objects(buffer)
+        # the objects jumped, don't interpolate from where they were
+        self.previous_centers.clear()
+
+    def save_render_centers(self):
+        previous_centers = self.previous_centers
+        previous_centers.clear()
+        for paddle in self.paddles:
+            previous_centers.append((paddle.center.x, paddle.center.y))
+        for ball in self.balls:
+            previous_centers.append((ball.center.x, ball.center.y))
+
+    def get_render_center(self, index, center):
+        # paddles come first, then balls, in the order save_render_centers stored them
+        alpha = self.render_alpha
+        if alpha >= 1 or index >= len(self.previous_centers):
+            return center.x, center.y
+
+        previous_x, previous_y = self.previous_centers[index]
+        if abs(center.x - previous_x) > self.w/4:
+            # the ball was put back in the middle, don't slide it across the screen
+            return center.x, center.y
+        return previous_x + (center.x - previous_x) * alpha, previous_y + (center.y - previous_y) * alpha
+
+    def update_steps_per_second(self):
+        self.sps_window_frames += 1
+        now = time.perf_counter()
+        elapsed = now - self.sps_window_start
+        if elapsed >= 1:
+            self.steps_per_second = self.sps_window_frames / elapsed
+            self.sps_window_start = now
+            self.sps_window_frames = 0
+            pygame.display.set_caption(f"pong - {self.steps_per_second:.0f} steps/s")
+            logger.info("steps per second: %.0f", self.steps_per_second)
+
+    def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                pong_log.close_trace_sink()
+                if self.recorder is not None:
+                    self.recorder.close()
+                if self.profiler is not None and self.profile_path is not None:
+                    self.profiler.print_summary()
+                    self.profiler.export_chrome_trace(self.profile_path)
                 pygame.quit()
                 quit()
 
@@ -354,87 +189,15 @@ class Pong_AI:
                     elif self.first_serve == True & (self.player1.win or self.player2.win):
                         self.restart()
 
-            keys_pressed = pygame.key.get_pressed()
-
-    def check_collisions(self):
-        # ball with ceiling or floor
-        for ball in self.balls:
-            if ball.center.y - ball.h/2 < 0 or ball.center.y + ball.h/2 > self.h:
-                ball.scale_speed(1, -1)
+            if event.type in REDRAW_EVENTS:
+                self.full_redraw = True
 
-        # ball with score zones
-        for ball in self.balls:
-            if ball.center.x - ball.w/2 < 0:
-                self.player2.score_points(1)
-            if ball.center.x + ball.w/2 > self.w:
-                self.player1.score_points(1)
-        
-        # paddle with ceiling or floor
-        for paddle in self.paddles:
-            if paddle.center.y - paddle.h/2 < 0: # ceiling
-                paddle.on_ceiling = True
-            elif paddle.center.y + paddle.h/2 > self.h: # floor
-                paddle.on_floor = True
-
-        # ball with paddle
-        # TODO: Ball behind paddle bug
-        for ball in self.balls:
-            # paddle 1
-            # check if ball is in front of first paddle
-            if (ball.center.y + ball.h/2 > (self.player1.paddle.center.y - self.player1.paddle.h/2)) and (ball.center.y - ball.h/2 < (self.player1.paddle.center.y + self.player1.paddle.h/2)):
-                ball.in_front_paddle1 = True
-            else:
-                ball.in_front_paddle1 = False
-            
-            # paddle 2
-            if (ball.center.y + ball.h/2 > (self.player2.paddle.center.y - self.player2.paddle.h/2)) and (ball.center.y - ball.h/2< (self.player2.paddle.center.y + self.player2.paddle.h/2)):
-                ball.in_front_paddle2 = True
-            else:
-                ball.in_front_paddle2 = False
-
-            # collide with front of paddles
-            close_1 = True
-            if (ball.center.x - ball.w/2  < self.player1.paddle.center.x - self.player1.paddle.w/2):
-                close_1 = False
-                
-            if (ball.center.x - ball.w/2 < self.player1.paddle.center.x + self.player1.paddle.w/2) & ball.in_front_paddle1 & close_1:
-                print("hitting paddle 1")
-                ball.get_hit(self.player1.paddle)
-                print(ball.speed)
-
-            close_2 = True
-            if (ball.center.x + ball.w/2 > self.player2.paddle.center.x + self.player2.paddle.w/2):
-                close_2 = False
-            if (ball.center.x + ball.w/2 > self.player2.paddle.center.x - self.player2.paddle.w/2) & ball.in_front_paddle2 & close_2:
-                print("hitting paddle 2")
-                ball.get_hit(self.player2.paddle)
-                print(ball.speed)
-        
-    def get_random_speed_components(self):
-        speed_x_rand = np.random.randint(100, 150) / 100
-        
-        # fix this, we don't like the gap
-        negative_speeds = list(range(-105, -99))
-        positive_speeds = list(range(100, 106))
-
-        total_speed_possibilities = negative_speeds + positive_speeds
-
-        speed_y_rand = np.random.choice(total_speed_possibilities) / 100
-
-        return speed_x_rand, speed_y_rand
-
-    def move_gameobjects(self):
-        # move paddles
-        for paddle in self.paddles:
-            paddle.move_by_speed()
-        
-        # move balls
-        for ball in self.balls:
-            ball.move_by_speed()
+            keys_pressed = pygame.key.get_pressed()
 
     def render_paddles(self):
-        for paddle in self.paddles:
-            pygame.draw.rect(self.display, WHITE, pygame.Rect(paddle.center.x - paddle.w/2, paddle.center.y - paddle.h/2, paddle.w, paddle.h))
+        for index, paddle in enumerate(self.paddles):
+            x, y = self.get_render_center(index, paddle.center)
+            self.dirty_rects.append(pygame.draw.rect(self.display, WHITE, pygame.Rect(x - paddle.w/2, y - paddle.h/2, paddle.w, paddle.h)))
             normalization_factor = 100 / MAX_MOMENTUM
             momentum_bar_size = (2 * abs(paddle.momentum) / 5) * normalization_factor
 
@@ -442,34 +205,46 @@ class Pong_AI:
             if paddle.momentum < 0:
                 negative_momentum_displacement = momentum_bar_size 
 
-            pygame.draw.rect(self.display, paddle.color, pygame.Rect(paddle.center.x, paddle.center.y - negative_momentum_displacement, 2, momentum_bar_size))
+            self.dirty_rects.append(pygame.draw.rect(self.display, paddle.color, pygame.Rect(x, y - negative_momentum_displacement, 2, momentum_bar_size)))
 
     def render_balls(self):
-        for ball in self.balls:
-            pygame.draw.rect(self.display, self.ball.color, 
-                            pygame.Rect(ball.center.x - ball.w/2, ball.center.y - ball.h/2, 
-                                        ball.w, ball.h))
+        n_paddles = len(self.paddles)
+        for index, ball in enumerate(self.balls):
+            x, y = self.get_render_center(n_paddles + index, ball.center)
+            self.dirty_rects.append(pygame.draw.rect(self.display, self.ball.color, 
+                                                     pygame.Rect(x - ball.w/2, y - ball.h/2, 
+                                                                 ball.w, ball.h)))
     
     def render_scores(self):
-        player1_score_surface = self.font.render(f"{self.player1.name}: " + str(self.player1.current_score), False, WHITE)
-        player2_score_surface = self.font.render(f"{self.player2.name}: " + str(self.player2.current_score), False, WHITE)
-        self.display.blit(player1_score_surface, (self.w/2 - player1_score_surface.get_width()/2, 
-                                                  self.h - player1_score_surface.get_height() -
-                                                  player2_score_surface.get_height()))
-        self.display.blit(player2_score_surface, (self.w/2 - player2_score_surface.get_width()/2, 
-                                                  self.h - player2_score_surface.get_height()))
+        scores = (self.player1.current_score, self.player2.current_score)
+        if scores != self.rendered_scores:
+            self.score_surfaces = (self.text_cache.render(f"{self.player1.name}: " + str(self.player1.current_score), WHITE),
+                                   self.text_cache.render(f"{self.player2.name}: " + str(self.player2.current_score), WHITE))
+            self.rendered_scores = scores
+        player1_score_surface, player2_score_surface = self.score_surfaces
+        self.dirty_rects.append(self.display.blit(player1_score_surface, (self.w/2 - player1_score_surface.get_width()/2, 
+                                                                          self.h - player1_score_surface.get_height() -
+                                                                          player2_score_surface.get_height())))
+        self.dirty_rects.append(self.display.blit(player2_score_surface, (self.w/2 - player2_score_surface.get_width()/2, 
+                                                                          self.h - player2_score_surface.get_height())))
     
     def render_win(self):
         for player in self.players:
             if player.win:
-                text_surface = self.font.render(player.name + " wins!", False, WHITE)
-                self.display.blit(text_surface, (self.w/2 - text_surface.get_width()/2, self.h/2 - text_surface.get_height()/2))
+                text_surface = self.text_cache.render(player.name + " wins!", WHITE)
+                self.dirty_rects.append(self.display.blit(text_surface, (self.w/2 - text_surface.get_width()/2, self.h/2 - text_surface.get_height()/2)))
 
     def update_screen(self):
-        # Clear the screen
-        self.display.fill(BLACK)
+        # only the areas drawn last frame and this frame change, everything else stays black
+        previous_rects = self.dirty_rects
+        self.dirty_rects = []
+
+        if self.full_redraw:
+            self.display.fill(BLACK)
+        else:
+            for rect in previous_rects:
+                self.display.fill(BLACK, rect)
 
-        
         if (self.player1.win == True) or (self.player2.win == True):
             self.render_win()
         else:
@@ -479,18 +254,42 @@ class Pong_AI:
             self.render_scores()
 
         # Update the display
-        pygame.display.update()
-
-    def restart(self):
-        for player in self.players:
-            player.reset()
-            self.initialize_gameobjects()
+        if self.full_redraw:
+            pygame.display.update()
+            self.full_redraw = False
+        else:
+            pygame.display.update(previous_rects + self.dirty_rects)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fps", type=int, default=GAME_SPEED, help="display frame rate limit, 0 for uncapped physics steps")
+    parser.add_argument("--step-hz", type=float, default=PHYSICS_HZ, help="physics steps per second of game time")
+    parser.add_argument("--render-every", type=int, default=DEFAULT_RENDER_EVERY, help="render every N frames when uncapped, 0 for never")
+    parser.add_argument("--action-repeat", type=int, default=1, help="physics steps each agent decision is held for")
+    parser.add_argument("--swept", action="store_true", help="use swept collision detection for the ball")
+    parser.add_argument("--debug", action="store_true", help="log per frame debug output")
+    parser.add_argument("--trace", help="write a binary event trace to this file")
+    parser.add_argument("--record", help="record every frame to this episode file")
+    parser.add_argument("--profile", help="record per stage timings and write a chrome trace to this file on exit")
+    args = parser.parse_args()
+
+    if args.debug:
+        pong_log.enable_debug()
+    else:
+        pong_log.configure()
+    if args.trace:
+        pong_log.set_trace_sink(pong_log.TraceSink(args.trace))
+
     player1_name = input("player 1 name: ")
     player2_name = input("player 2 name: ")
-    game = Pong_AI(player1_name, player2_name)
+    game = Pong_AI(player1_name, player2_name, game_speed=args.fps, render_every=args.render_every,
+                   swept_collisions=args.swept, step_hz=args.step_hz, action_repeat=args.action_repeat)
+    if args.record:
+        game.recorder = EpisodeRecorder(args.record, w=game.w, h=game.h)
+    if args.profile:
+        game.enable_profiling()
+        game.profile_path = args.profile
     
     game_over = False
     while True:
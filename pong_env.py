@@ -0,0 +1,72 @@
+import numpy as np
+from agent import Direction
+from pong_sim import Pong_Sim
+
+DEFAULT_MAX_STEPS = 10000 # frames before an episode is truncated
+
+class PongEnv():
+    # gymnasium style reset/step wrapper around the headless simulation.
+    # observations are the game's (2, STATE_SIZE) float32 buffer, row 0 for player 1 and
+    # row 1 for player 2. Observation and reward buffers are rewritten in place every step.
+    # rewards are (player 1, player 2), +1 for scoring a point and -1 for conceding one.
+    # each step holds the actions for action_repeat frames and sums the rewards over them
+    def __init__(self, player1_name="player 1", player2_name="player 2", w=640, h=480, max_steps=DEFAULT_MAX_STEPS, seed=None, swept_collisions=False, action_repeat=1):
+        self.game = Pong_Sim(player1_name, player2_name, w, h, seed=seed, swept_collisions=swept_collisions)
+        self.max_steps = max_steps
+        self.action_repeat = action_repeat
+        self.steps = 0
+        self.rewards = np.zeros(2, dtype=np.float32)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.game.seed(seed)
+
+        self.game.restart()
+        self.game.frame_count = 0
+        self.steps = 0
+
+        return self.game.observations, self.get_info()
+
+    def step(self, action_p1:Direction, action_p2:Direction):
+        game = self.game
+        score1 = game.player1.current_score
+        score2 = game.player2.current_score
+
+        game.apply_directions(action_p1, action_p2)
+        for _ in range(self.action_repeat):
+            terminated, _ = game.step_physics()
+            if game.recorder is not None:
+                game.recorder.record(game)
+            self.steps += 1
+            if terminated or self.steps >= self.max_steps:
+                break
+        game.send_states()
+
+        scored1 = game.player1.current_score - score1
+        scored2 = game.player2.current_score - score2
+        self.rewards[0] = scored1 - scored2
+        self.rewards[1] = scored2 - scored1
+
+        truncated = (not terminated) and self.steps >= self.max_steps
+
+        return game.observations, self.rewards, terminated, truncated, self.get_info()
+
+    def get_info(self):
+        return {"frame": self.game.frame_count,
+                "scores": (self.game.player1.current_score, self.game.player2.current_score)}
+
+
+if __name__ == "__main__":
+    env = PongEnv()
+    observations, info = env.reset(seed=0)
+    rng = np.random.default_rng(0)
+
+    episodes = 0
+    while episodes < 10:
+        action_p1 = Direction(rng.integers(0, 3))
+        action_p2 = Direction(rng.integers(0, 3))
+        observations, rewards, terminated, truncated, info = env.step(action_p1, action_p2)
+        if terminated or truncated:
+            print(f"episode {episodes}: {info}")
+            episodes += 1
+            observations, info = env.reset()
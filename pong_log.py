@@ -0,0 +1,76 @@
+import logging
+import struct
+import numpy as np
+
+# everything logs through this logger. Debug output is off unless enable_debug() is called,
+# and messages use % style arguments so nothing is formatted while a level is disabled
+logger = logging.getLogger("pong")
+logger.addHandler(logging.NullHandler())
+
+# binary trace events
+EVENT_SERVE = 0
+EVENT_PADDLE_HIT = 1
+EVENT_SCORE = 2
+
+TRACE_RECORD = struct.Struct("<IBfff") # frame, event, then three event specific values
+TRACE_DTYPE = np.dtype([("frame", "<u4"), ("event", "u1"), ("a", "<f4"), ("b", "<f4"), ("c", "<f4")])
+DEFAULT_TRACE_BUFFER = 4096 # records
+
+trace_sink = None
+stream_handler = None # added by the first configure, later calls only change the level
+frame = 0 # stamped on every trace record, set by the game loop
+
+def enable_debug():
+    configure(logging.DEBUG)
+
+def configure(level=logging.INFO):
+    global stream_handler
+    if stream_handler is None:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(stream_handler)
+    logger.setLevel(level)
+
+class TraceSink():
+    def __init__(self, path, buffer_records=DEFAULT_TRACE_BUFFER):
+        self.file = open(path, "wb")
+        self.capacity = buffer_records
+        self.buffer = bytearray(TRACE_RECORD.size * buffer_records)
+        self.count = 0
+
+    def record(self, event, a=0, b=0, c=0):
+        TRACE_RECORD.pack_into(self.buffer, self.count * TRACE_RECORD.size, frame, event, a, b, c)
+        self.count += 1
+        if self.count == self.capacity:
+            self.flush()
+
+    def flush(self):
+        self.file.write(memoryview(self.buffer)[:self.count * TRACE_RECORD.size])
+        self.count = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def set_trace_sink(sink):
+    global trace_sink
+    trace_sink = sink
+
+def close_trace_sink():
+    global trace_sink
+    if trace_sink is not None:
+        trace_sink.close()
+        trace_sink = None
+
+def trace(event, a=0, b=0, c=0):
+    if trace_sink is not None:
+        trace_sink.record(event, a, b, c)
+
+def read_trace(path):
+    return np.fromfile(path, dtype=TRACE_DTYPE)
@@ -0,0 +1,792 @@
+import math
+import numpy as np
+import pong_log
+from pong_log import logger
+from profiler import FrameProfiler, DEFAULT_CAPACITY as DEFAULT_PROFILE_CAPACITY
+from agent import Agent, Direction, GameStateParameters, STATE_SIZE, DIRECTION_SIGNS
+
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+WHITE = (255, 255, 255)
+
+DEFAULT_PADDLE_SPEED = 6 # pixels
+MAX_BALL_SPEED_X = 10
+MAX_BALL_SPEED_Y = 20
+MAX_MAGNITUDE = np.sqrt(MAX_BALL_SPEED_X**2 + MAX_BALL_SPEED_Y**2)
+PHYSICS_HZ = 60 # ticks per second of game time, speeds are in pixels per tick
+SERVE_WAIT = 1 # seconds of game time between a point and the next serve
+DEFAULT_RESET_WAIT = round(SERVE_WAIT * PHYSICS_HZ) # ticks
+MAX_MOMENTUM = 100 # must be divisible by 10. Can be left alone, just tweak the scaling
+MOMENTUM_STEPS = MAX_MOMENTUM / np.gcd(MAX_MOMENTUM, 10)
+MOMENTUM_SCALING = 0.5 # 1 means standard rate of momentum scaling
+
+WINNING_SCORE = 1
+
+class Vector():
+    # mutable x, y pair. Paddles and balls update theirs in place instead of allocating new ones
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x=0, y=0):
+        self.x = x
+        self.y = y
+
+    def set(self, x, y):
+        self.x = x
+        self.y = y
+
+    # read access like the namedtuples these replaced: unpacking, indexing, len, equality and hashing
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __getitem__(self, index):
+        return (self.x, self.y)[index]
+
+    def __len__(self):
+        return 2
+
+    def __eq__(self, other):
+        return tuple(self) == tuple(other)
+
+    # hashes the current values, one used as a dict key or in a set must not be changed in place
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __repr__(self):
+        return f"{type(self).__name__}(x={self.x}, y={self.y})"
+
+class Point(Vector):
+    __slots__ = ()
+
+class Speed_Vector(Vector):
+    __slots__ = ()
+
+# a paddle hit adds one of MOMENTUM_STEPS evenly spaced y speeds between 0 and the ball's x speed.
+# momentum selects the step, anything below the first step wraps around to the largest one
+HIT_STEPS = int(MOMENTUM_STEPS)
+HIT_STEP_SCALE = (MAX_MOMENTUM / 100) / MOMENTUM_STEPS # step size per unit of ball x speed
+
+MAX_SWEPT_COLLISIONS = 4 # bounces resolved per ball per step before the rest of the move is unchecked
+SWEPT_EPSILON = 1e-9 # frames, rounding slack for a ball that starts exactly on a paddle face
+
+# paddle y speed for each Direction value
+PADDLE_SPEEDS = tuple(sign * DEFAULT_PADDLE_SPEED for sign in DIRECTION_SIGNS)
+
+# flat float64 snapshot layout, see Pong_Sim.snapshot. The object section is everything restart() resets
+PADDLE_FIELDS = 7
+BALL_FIELDS = 7
+PADDLE1_OFFSET = 0
+PADDLE2_OFFSET = PADDLE1_OFFSET + PADDLE_FIELDS
+BALL_OFFSET = PADDLE2_OFFSET + PADDLE_FIELDS
+PLAYERS_OFFSET = BALL_OFFSET + BALL_FIELDS # score and win of both players, then whether the objects are shown
+GAME_OFFSET = PLAYERS_OFFSET + 5
+OBSERVATIONS_OFFSET = GAME_OFFSET + 9 # both observation rows, mid action repeat they are older than the objects
+RNG_OFFSET = OBSERVATIONS_OFFSET + 2 * STATE_SIZE # game, agent 1 and agent 2 PCG64 states, stored as uint64 words in the same buffer
+RNG_WORDS = 6
+SNAPSHOT_SIZE = RNG_OFFSET + 3 * RNG_WORDS
+UINT64_MASK = (1 << 64) - 1
+
+def write_rng_state(rng, words):
+    state = rng.bit_generator.state
+    words[:] = (state["state"]["state"] >> 64, state["state"]["state"] & UINT64_MASK,
+                state["state"]["inc"] >> 64, state["state"]["inc"] & UINT64_MASK,
+                state["has_uint32"], state["uinteger"])
+
+def read_rng_state(rng, words):
+    words = words.tolist()
+    rng.bit_generator.state = {"bit_generator": "PCG64",
+                               "state": {"state": (words[0] << 64) | words[1],
+                                         "inc": (words[2] << 64) | words[3]},
+                               "has_uint32": words[4], "uinteger": words[5]}
+
+def get_hit_y_speed_increment(momentum, speed_x):
+    if momentum == 0:
+        return 0
+
+    choice = int(abs(momentum) / MOMENTUM_STEPS) - 1
+    if choice < 0:
+        choice += HIT_STEPS
+    elif choice >= HIT_STEPS:
+        choice = HIT_STEPS - 1
+    y_speed_increment = choice * (abs(speed_x) * HIT_STEP_SCALE)
+
+    if momentum < 0:
+        return -y_speed_increment
+    return y_speed_increment
+
+def get_hit_speeds(speed_x, speed_y, momentum, x_speed_scale):
+    # batch version of Ball.get_hit for arrays of balls, returns the unclamped new speeds
+    choice = (np.abs(momentum) // MOMENTUM_STEPS).astype(np.int64) - 1
+    choice[choice < 0] += HIT_STEPS
+    np.minimum(choice, HIT_STEPS - 1, out=choice)
+    y_speed_increment = np.sign(momentum) * choice * (np.abs(speed_x) * HIT_STEP_SCALE)
+
+    return -1 * (speed_x * x_speed_scale), speed_y + y_speed_increment
+
+class Player():
+    def __init__(self, name):
+        self.name = name
+        self.current_score = 0
+        self.win = False
+        self.paddle = Paddle()
+        self.agent = Agent()
+
+    def score_points(self, points):
+        self.current_score += points
+
+    def check_win(self):
+        if self.current_score >= WINNING_SCORE:
+            self.win = True
+            return True
+        
+    def reset(self):
+        self.current_score = 0
+        self.win = 0
+
+class Paddle():
+    __slots__ = ('game_w', 'game_h', 'w', 'h', 'center', 'speed', 'color', 'momentum',
+                 'momentum_steps', 'on_ceiling', 'on_floor')
+
+    def __init__(self, global_center=Point(0, 0), w=0, h=0, color=WHITE, game_w=0, game_h=0):
+        self.game_w = game_w
+        self.game_h = game_h
+        
+        self.w = w
+        self.h = h
+        self.center = Point(global_center.x, global_center.y)
+        self.color = color
+        self.speed = Speed_Vector(0, 0)
+        self.momentum = 0
+        self.momentum_steps = MOMENTUM_STEPS
+        self.on_ceiling = False
+        self.on_floor = False
+    
+    def set_speed(self, new_speed:Speed_Vector):
+        self.speed.set(new_speed.x, new_speed.y)
+
+    def write_state(self, buffer, offset):
+        buffer[offset:offset + PADDLE_FIELDS] = (self.center.x, self.center.y, self.speed.x, self.speed.y,
+                                                 self.momentum, self.on_ceiling, self.on_floor)
+
+    def read_state(self, buffer, offset):
+        center_x, center_y, speed_x, speed_y, self.momentum, on_ceiling, on_floor = buffer[offset:offset + PADDLE_FIELDS].tolist()
+        self.center.set(center_x, center_y)
+        self.speed.set(speed_x, speed_y)
+        self.on_ceiling = bool(on_ceiling)
+        self.on_floor = bool(on_floor)
+
+    def move_by_speed(self, dt=1):
+        center = self.center
+        new_center_y = center.y + self.speed.y * dt
+        if new_center_y - self.h/2 < 0 or new_center_y + self.h/2 > self.game_h: # screen edges
+            pass
+        
+        else:
+            self.increment_momentum(dt)
+
+            center.x += self.speed.x * dt
+            center.y = new_center_y
+        
+    def increment_momentum(self, dt=1):
+        speed_y = self.speed.y
+        if speed_y == 0:
+            self.momentum = 0
+            return
+
+        next_momentum = self.momentum + speed_y
+
+        if (abs(self.momentum) == MAX_MOMENTUM) & (abs(next_momentum) < abs(self.momentum)): # direction change
+            self.momentum = 0
+
+        if abs(self.momentum) < MAX_MOMENTUM:
+            self.momentum += speed_y * MOMENTUM_SCALING * dt
+
+class Ball():
+    __slots__ = ('rng', 'game_w', 'game_h', 'center', 'w', 'h', 'color', 'speed',
+                 'in_front_paddle1', 'in_front_paddle2', 'reset_wait')
+
+    def __init__(self, global_center: Point, w, h, color:tuple, game_w, game_h, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.game_w = game_w
+        self.game_h = game_h
+        
+        self.center = Point(global_center.x, global_center.y)
+        self.w = w
+        self.h = h
+        self.color = color
+        self.speed = Speed_Vector(0, 0)
+        self.in_front_paddle1 = False
+        self.in_front_paddle2 = False
+        self.reset_wait = 0
+
+    def clamp_speed(self):
+        speed = self.speed
+        if speed.x > MAX_BALL_SPEED_X:
+            speed.x = MAX_BALL_SPEED_X
+        elif speed.x < -MAX_BALL_SPEED_X:
+            speed.x = -MAX_BALL_SPEED_X
+
+        if speed.y > MAX_BALL_SPEED_Y:
+            speed.y = MAX_BALL_SPEED_Y
+        elif speed.y < -MAX_BALL_SPEED_Y:
+            speed.y = -MAX_BALL_SPEED_Y
+
+        if speed.x == 0:
+            return
+        
+        magnitude = math.sqrt(speed.x**2 + speed.y ** 2)
+        if magnitude > MAX_MAGNITUDE:
+            angle = math.tan(speed.y / speed.x)
+            speed.x = MAX_MAGNITUDE * math.cos(angle)
+            speed.y = MAX_MAGNITUDE * math.sin(angle)
+    
+    def change_speed(self, new_speed:Speed_Vector):
+        self.speed.set(new_speed.x, new_speed.y)
+
+        self.clamp_speed()
+
+    def set_speed(self, speed_x, speed_y):
+        self.speed.set(speed_x, speed_y)
+
+        self.clamp_speed()
+
+    def add_speed(self, x_add, y_add):
+        self.set_speed(self.speed.x + x_add, self.speed.y + y_add)
+
+    def scale_speed(self, x_mult, y_mult):
+        self.set_speed(self.speed.x * x_mult, self.speed.y * y_mult)
+    
+    def move_to_position(self, new_center:Point):
+        self.center.set(new_center.x, new_center.y)
+
+    def write_state(self, buffer, offset):
+        buffer[offset:offset + BALL_FIELDS] = (self.center.x, self.center.y, self.speed.x, self.speed.y,
+                                               self.in_front_paddle1, self.in_front_paddle2, self.reset_wait)
+
+    def read_state(self, buffer, offset):
+        center_x, center_y, speed_x, speed_y, in_front_paddle1, in_front_paddle2, self.reset_wait = buffer[offset:offset + BALL_FIELDS].tolist()
+        self.center.set(center_x, center_y)
+        self.speed.set(speed_x, speed_y)
+        self.in_front_paddle1 = bool(in_front_paddle1)
+        self.in_front_paddle2 = bool(in_front_paddle2)
+
+    def move_by_speed(self, dt=1):
+        self.center.x += self.speed.x * dt
+        self.center.y += self.speed.y * dt
+
+    def reset(self, dt=1):
+        if self.center.x - self.w/2 < 0 or self.center.x + self.w/2 > self.game_w:
+            # ball has been scored
+            self.set_speed(0, 0)
+            self.center.set(self.game_w/2, self.game_h/2)
+            self.reset_wait = DEFAULT_RESET_WAIT
+
+        elif self.reset_wait > 0:
+            self.reset_wait = max(self.reset_wait - dt, 0)
+        elif self.reset_wait == 0:
+            self.reset_wait -= 1
+            self.serve()
+    
+    def serve(self):
+        # serve the ball
+        positive_range = list(range(2, 4))
+        negative_range = list(range(-3, -1))
+        speed_possibilities = positive_range + negative_range
+        start_speed_x = int(self.rng.choice(speed_possibilities))
+        self.set_speed(start_speed_x, 0)
+        logger.debug("serving: %s", self.speed)
+        pong_log.trace(pong_log.EVENT_SERVE, self.speed.x, self.speed.y)
+    
+    def get_hit(self, paddle:Paddle):
+        # generate random x speed increase
+        x_speed_scale = int(self.rng.integers(100, 150)) / 100
+
+        # add y speed based on momentum and current ball x speed
+        y_speed_increment = get_hit_y_speed_increment(paddle.momentum, self.speed.x)
+
+        self.set_speed(-1 * (self.speed.x * x_speed_scale), self.speed.y + y_speed_increment)
+
+class Pong_Sim:
+    # headless simulation core, no pygame. Pong_AI renders on top of this
+    def __init__(self, player1_name, player2_name, w=640, h=480, first_serve=True, seed=None, swept_collisions=False, dt=1, action_repeat=1):
+        self.game_state_parameters = GameStateParameters(w, h, DEFAULT_PADDLE_SPEED,
+                                                         MAX_MOMENTUM, MAX_BALL_SPEED_X, 
+                                                         MAX_BALL_SPEED_Y)
+        self.w = w
+        self.h = h
+
+        self.player1_name = player1_name
+        self.player2_name = player2_name
+
+        # one normalized observation row per player, agents read views of these rows
+        self.observations = np.zeros((2, STATE_SIZE), dtype=np.float32)
+        self.observation_scale, self.observation_offset = self.game_state_parameters.get_normalization()
+        self.initialize_players()
+        self.balls = []
+        self.ball = None
+        self.seed(seed)
+
+        # headless games have no space bar, so serve straight away by default
+        self.first_serve = first_serve
+        # with swept collisions balls bounce at the exact time of impact while moving,
+        # instead of when they already overlap a wall or paddle at the start of a frame
+        self.swept_collisions = swept_collisions
+        # ticks simulated per step, below 1 for finer steps and above 1 for coarser ones
+        self.dt = dt
+        self.frame_count = 0
+        self.game_over = False
+        self.score = 0
+        self.profiler = None
+        self.recorder = None
+
+        # transitions are stored from send_states when a replay buffer is attached
+        self.replay_buffer = None
+        self.previous_observations = np.zeros_like(self.observations)
+        self.stored_score1 = 0
+        self.stored_score2 = 0
+
+        # actions decided by the agents or the policy, as Direction values
+        self.policy = None
+        self.action1 = Direction.neutral.value
+        self.action2 = Direction.neutral.value
+        # actions are held for action_repeat frames, repeat_left counts down to the next decision
+        self.action_repeat = action_repeat
+        self.repeat_left = 0
+        self.initialize_gameobjects()
+        self.write_observations()
+
+        # restart() puts the objects back from here instead of building new ones
+        self.initial_snapshot = self.snapshot()
+
+    def initialize_players(self):
+        self.player1 = Player(self.player1_name)
+        self.player2 = Player(self.player2_name)
+        self.player1.agent.normalizedState.set_parameters(self.game_state_parameters)
+        self.player2.agent.normalizedState.set_parameters(self.game_state_parameters)
+        self.player1.agent.observation = self.observations[0]
+        self.player2.agent.observation = self.observations[1]
+        self.players = [self.player1, self.player2]
+
+    def seed(self, seed=None):
+        # the game and each agent get their own stream spawned from one seed sequence
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        game_seed, player1_seed, player2_seed = seed.spawn(3)
+
+        self.rng = np.random.default_rng(game_seed)
+        self.player1.agent.rng = np.random.default_rng(player1_seed)
+        self.player2.agent.rng = np.random.default_rng(player2_seed)
+        # not through self.balls, check_wins empties it when a game ends
+        if self.ball is not None:
+            self.ball.rng = self.rng
+
+    def send_states(self):
+        if self.replay_buffer is not None:
+            np.copyto(self.previous_observations, self.observations)
+            self.write_observations()
+            self.store_transitions()
+        else:
+            self.write_observations()
+
+    def write_observations(self):
+        # written in place, the agents hold views of these rows
+        observations = self.observations
+        paddle1 = self.player1.paddle
+        paddle2 = self.player2.paddle
+        ball = self.ball
+        observations[0] = (paddle1.center.y, paddle1.speed.y, paddle1.momentum,
+                           paddle2.center.y, paddle2.speed.y, paddle2.momentum,
+                           ball.center.x, ball.center.y, ball.speed.x, ball.speed.y)
+        observations *= self.observation_scale
+        observations += self.observation_offset
+
+        # player 2 sees the same values with the paddles swapped
+        observations[1, 0:3] = observations[0, 3:6]
+        observations[1, 3:6] = observations[0, 0:3]
+        observations[1, 6:] = observations[0, 6:]
+
+    def store_transitions(self):
+        # one transition per player, rewarded +1 for scoring and -1 for conceding since the last frame
+        score1 = self.player1.current_score
+        score2 = self.player2.current_score
+        reward = (score1 - self.stored_score1) - (score2 - self.stored_score2)
+        self.stored_score1 = score1
+        self.stored_score2 = score2
+
+        buffer = self.replay_buffer
+        buffer.add(self.previous_observations[0], self.action1, reward, self.observations[0], self.game_over)
+        buffer.add(self.previous_observations[1], self.action2, -reward, self.observations[1], self.game_over)
+
+    def initialize_gameobjects(self):
+        # paddles
+        self.paddles = []
+        paddle1_starting_location = Point(20, self.h/2)
+        self.player1.paddle = Paddle(paddle1_starting_location, 10, 100, BLUE, self.w, self.h)
+        self.paddles.append(self.player1.paddle)
+
+        paddle2_starting_location = Point(self.w-20, self.h/2)
+        self.player2.paddle = Paddle(paddle2_starting_location, 10, 100, RED, self.w, self.h)
+        self.paddles.append(self.player2.paddle)
+
+        # balls
+        self.balls = []
+        ball_starting_position = Point(self.w/2, self.h/2)
+        self.ball = Ball(ball_starting_position, 10, 10, WHITE, self.w, self.h, self.rng)
+        self.balls.append(self.ball)
+
+    def step_frame(self):
+        self.begin_profile_frame()
+
+        game_over, score = self.step_with_repeat()
+
+        if self.recorder is not None:
+            self.recorder.record(self)
+
+        return game_over, score
+
+    def step_with_repeat(self):
+        # one physics step, the agents only decide when the last action has been held action_repeat frames
+        if self.repeat_left == 0:
+            self.agent_input()
+            self.repeat_left = self.action_repeat
+        self.repeat_left -= 1
+
+        game_over, score = self.step_physics()
+
+        # observations and transitions only at decision boundaries, rewards add up in between
+        if self.repeat_left == 0 or game_over:
+            self.repeat_left = 0
+            self.send_states()
+
+        return game_over, score
+
+    def step_physics(self):
+        self.begin_frame()
+
+        self.check_collisions()
+
+        self.reset_balls()
+
+        self.move_gameobjects()
+
+        return self.check_wins()
+
+    def begin_frame(self):
+        self.frame_count += 1
+        pong_log.frame = self.frame_count
+
+    def reset_balls(self):
+        if self.first_serve == True:
+            for ball in self.balls:
+                ball.reset(self.dt)
+
+    def check_wins(self):
+        score = 0
+        game_over = False
+
+        for player in self.players:
+            win = player.check_win()
+            if win:
+                game_over = True
+                score = player.current_score
+                self.balls.clear()
+                self.paddles.clear()
+
+        self.game_over = game_over
+        self.score = score
+        return game_over, score
+
+    def get_stages(self):
+        # the stages of step_frame in order, used for profiling
+        return (("agent_input", self.agent_input),
+                ("check_collisions", self.check_collisions),
+                ("reset_balls", self.reset_balls),
+                ("move_gameobjects", self.move_gameobjects),
+                ("check_wins", self.check_wins),
+                ("send_states", self.send_states))
+
+    def enable_profiling(self, capacity=DEFAULT_PROFILE_CAPACITY):
+        # every stage method is shadowed by a timed wrapper on the instance, so profiled frames
+        # run exactly the same code path, stages that are skipped in a frame are not recorded
+        self.disable_profiling()
+        stages = self.get_stages()
+        self.profiler = FrameProfiler([name for name, function in stages], capacity)
+        self.profiled_methods = [function.__name__ for name, function in stages]
+        for index, (name, function) in enumerate(stages):
+            setattr(self, function.__name__, self.get_timed_stage(index, function))
+        return self.profiler
+
+    def get_timed_stage(self, index, function):
+        profiler = self.profiler
+        def timed_stage():
+            return profiler.time_stage(index, function)
+        return timed_stage
+
+    def disable_profiling(self):
+        if self.profiler is None:
+            return
+        for method in self.profiled_methods:
+            self.__dict__.pop(method, None)
+        self.profiler = None
+
+    def begin_profile_frame(self):
+        if self.profiler is not None:
+            self.profiler.begin_frame(self.frame_count + 1)
+
+    def agent_input(self):
+        if self.policy is not None:
+            # one decision call for both paddles
+            actions = self.policy.act(self.observations)
+            self.apply_actions(int(actions[0]), int(actions[1]))
+            return
+
+        self.player1.agent.play_move()
+        self.player2.agent.play_move()
+
+        self.apply_actions(self.player1.agent.direction.value, self.player2.agent.direction.value)
+
+    def apply_directions(self, direction1:Direction, direction2:Direction):
+        self.apply_actions(direction1.value, direction2.value)
+
+    def apply_actions(self, action1, action2):
+        # actions are Direction values
+        self.action1 = action1
+        self.action2 = action2
+
+        self.player1.paddle.speed.set(0, PADDLE_SPEEDS[action1])
+        self.player2.paddle.speed.set(0, PADDLE_SPEEDS[action2])
+
+    def attach_observations(self, observations):
+        # use an outside (2, STATE_SIZE) float32 buffer, e.g. a slice of a batch of games
+        self.observations = observations
+        self.player1.agent.observation = observations[0]
+        self.player2.agent.observation = observations[1]
+        self.write_observations()
+
+    def check_collisions(self):
+        # ball with ceiling or floor
+        if not self.swept_collisions:
+            for ball in self.balls:
+                if ball.center.y - ball.h/2 < 0 or ball.center.y + ball.h/2 > self.h:
+                    ball.scale_speed(1, -1)
+
+        # ball with score zones
+        for ball in self.balls:
+            if ball.center.x - ball.w/2 < 0:
+                self.player2.score_points(1)
+                pong_log.trace(pong_log.EVENT_SCORE, 2, self.player2.current_score)
+            if ball.center.x + ball.w/2 > self.w:
+                self.player1.score_points(1)
+                pong_log.trace(pong_log.EVENT_SCORE, 1, self.player1.current_score)
+        
+        # paddle with ceiling or floor
+        for paddle in self.paddles:
+            if paddle.center.y - paddle.h/2 < 0: # ceiling
+                paddle.on_ceiling = True
+            elif paddle.center.y + paddle.h/2 > self.h: # floor
+                paddle.on_floor = True
+
+        if self.swept_collisions:
+            # walls and paddles are handled in move_gameobjects
+            return
+
+        # ball with paddle
+        # TODO: Ball behind paddle bug, fixed when swept_collisions is on
+        for ball in self.balls:
+            # paddle 1
+            # check if ball is in front of first paddle
+            if (ball.center.y + ball.h/2 > (self.player1.paddle.center.y - self.player1.paddle.h/2)) and (ball.center.y - ball.h/2 < (self.player1.paddle.center.y + self.player1.paddle.h/2)):
+                ball.in_front_paddle1 = True
+            else:
+                ball.in_front_paddle1 = False
+            
+            # paddle 2
+            if (ball.center.y + ball.h/2 > (self.player2.paddle.center.y - self.player2.paddle.h/2)) and (ball.center.y - ball.h/2< (self.player2.paddle.center.y + self.player2.paddle.h/2)):
+                ball.in_front_paddle2 = True
+            else:
+                ball.in_front_paddle2 = False
+
+            # collide with front of paddles
+            close_1 = True
+            if (ball.center.x - ball.w/2  < self.player1.paddle.center.x - self.player1.paddle.w/2):
+                close_1 = False
+                
+            if (ball.center.x - ball.w/2 < self.player1.paddle.center.x + self.player1.paddle.w/2) & ball.in_front_paddle1 & close_1:
+                ball.get_hit(self.player1.paddle)
+                logger.debug("hitting paddle 1: %s", ball.speed)
+                pong_log.trace(pong_log.EVENT_PADDLE_HIT, 1, ball.speed.x, ball.speed.y)
+
+            close_2 = True
+            if (ball.center.x + ball.w/2 > self.player2.paddle.center.x + self.player2.paddle.w/2):
+                close_2 = False
+            if (ball.center.x + ball.w/2 > self.player2.paddle.center.x - self.player2.paddle.w/2) & ball.in_front_paddle2 & close_2:
+                ball.get_hit(self.player2.paddle)
+                logger.debug("hitting paddle 2: %s", ball.speed)
+                pong_log.trace(pong_log.EVENT_PADDLE_HIT, 2, ball.speed.x, ball.speed.y)
+        
+    def get_random_speed_components(self):
+        speed_x_rand = self.rng.integers(100, 150) / 100
+        
+        # fix this, we don't like the gap
+        negative_speeds = list(range(-105, -99))
+        positive_speeds = list(range(100, 106))
+
+        total_speed_possibilities = negative_speeds + positive_speeds
+
+        speed_y_rand = self.rng.choice(total_speed_possibilities) / 100
+
+        return speed_x_rand, speed_y_rand
+
+    def move_gameobjects(self):
+        # move paddles
+        dt = self.dt
+        for paddle in self.paddles:
+            paddle.move_by_speed(dt)
+        
+        # move balls
+        if self.swept_collisions:
+            for ball in self.balls:
+                self.move_ball_swept(ball, dt)
+        else:
+            for ball in self.balls:
+                ball.move_by_speed(dt)
+
+    def move_ball_swept(self, ball, dt=1.0):
+        # moves the ball by speed * dt, stopping at every wall or paddle front it touches on the way.
+        # paddles are treated as standing still at their moved positions for the rest of the step
+        paddle1 = self.player1.paddle
+        paddle2 = self.player2.paddle
+        half_w = ball.w/2
+        half_h = ball.h/2
+        remaining = dt
+
+        for _ in range(MAX_SWEPT_COLLISIONS):
+            center = ball.center
+            speed = ball.speed
+            hit_time = remaining
+            hit_wall = False
+            hit_paddle = None
+
+            # ceiling and floor, a ball already past one bounces straight away
+            if speed.y < 0:
+                time = max((half_h - center.y) / speed.y, 0)
+                if time < hit_time:
+                    hit_time, hit_wall = time, True
+            elif speed.y > 0:
+                time = max((self.h - half_h - center.y) / speed.y, 0)
+                if time < hit_time:
+                    hit_time, hit_wall = time, True
+
+            # only the side of a paddle facing the middle of the screen can be hit,
+            # a ball that is already behind it keeps going
+            paddle = None
+            if speed.x < 0:
+                paddle = paddle1
+                face_x = paddle.center.x + paddle.w/2 + half_w
+            elif speed.x > 0:
+                paddle = paddle2
+                face_x = paddle.center.x - paddle.w/2 - half_w
+            if paddle is not None:
+                time = (face_x - center.x) / speed.x
+                if -SWEPT_EPSILON <= time < hit_time:
+                    time = max(time, 0)
+                    y_at_hit = center.y + speed.y * time
+                    if abs(y_at_hit - paddle.center.y) < (paddle.h + ball.h)/2:
+                        hit_time, hit_wall, hit_paddle = time, False, paddle
+
+            center.x += speed.x * hit_time
+            center.y += speed.y * hit_time
+            remaining -= hit_time
+
+            if hit_wall:
+                ball.scale_speed(1, -1)
+            elif hit_paddle is not None:
+                player = 1 if hit_paddle is paddle1 else 2
+                ball.get_hit(hit_paddle)
+                logger.debug("hitting paddle %d: %s", player, ball.speed)
+                pong_log.trace(pong_log.EVENT_PADDLE_HIT, player, ball.speed.x, ball.speed.y)
+            else:
+                return
+
+        # out of collision budget, finish the step without further checks
+        ball.center.x += ball.speed.x * remaining
+        ball.center.y += ball.speed.y * remaining
+
+    def snapshot(self, out=None):
+        # copies the whole game state into a flat float64 buffer of SNAPSHOT_SIZE, out can be a
+        # preallocated buffer or a row of one so that branching from a state allocates nothing
+        buffer = np.empty(SNAPSHOT_SIZE) if out is None else out
+        self.player1.paddle.write_state(buffer, PADDLE1_OFFSET)
+        self.player2.paddle.write_state(buffer, PADDLE2_OFFSET)
+        self.ball.write_state(buffer, BALL_OFFSET)
+        buffer[PLAYERS_OFFSET:GAME_OFFSET] = (self.player1.current_score, self.player1.win,
+                                             self.player2.current_score, self.player2.win,
+                                             len(self.balls) > 0)
+        buffer[GAME_OFFSET:OBSERVATIONS_OFFSET] = (self.frame_count, self.first_serve, self.game_over, self.score,
+                                          self.action1, self.action2, self.repeat_left,
+                                          self.stored_score1, self.stored_score2)
+        buffer[OBSERVATIONS_OFFSET:RNG_OFFSET] = self.observations.ravel()
+
+        words = buffer[RNG_OFFSET:SNAPSHOT_SIZE].view(np.uint64)
+        for index, rng in enumerate((self.rng, self.player1.agent.rng, self.player2.agent.rng)):
+            write_rng_state(rng, words[index * RNG_WORDS:(index + 1) * RNG_WORDS])
+        return buffer
+
+    def restore(self, buffer):
+        self.restore_objects(buffer)
+        (frame_count, first_serve, game_over, score, action1, action2, repeat_left,
+         stored_score1, stored_score2) = buffer[GAME_OFFSET:OBSERVATIONS_OFFSET].tolist()
+        self.frame_count = int(frame_count)
+        self.first_serve = bool(first_serve)
+        self.game_over = bool(game_over)
+        self.score = int(score)
+        self.action1 = int(action1)
+        self.action2 = int(action2)
+        self.repeat_left = int(repeat_left)
+        self.stored_score1 = int(stored_score1)
+        self.stored_score2 = int(stored_score2)
+
+        words = buffer[RNG_OFFSET:SNAPSHOT_SIZE].view(np.uint64)
+        for index, rng in enumerate((self.rng, self.player1.agent.rng, self.player2.agent.rng)):
+            read_rng_state(rng, words[index * RNG_WORDS:(index + 1) * RNG_WORDS])
+
+        # copied back rather than recomputed, the agents hold views of these rows
+        self.observations[:] = buffer[OBSERVATIONS_OFFSET:RNG_OFFSET].reshape(2, STATE_SIZE)
+
+    def restore_objects(self, buffer):
+        # paddles, ball and players only, the frame count and random stream are left alone
+        self.player1.paddle.read_state(buffer, PADDLE1_OFFSET)
+        self.player2.paddle.read_state(buffer, PADDLE2_OFFSET)
+        self.ball.read_state(buffer, BALL_OFFSET)
+
+        score1, win1, score2, win2, shown = buffer[PLAYERS_OFFSET:GAME_OFFSET].tolist()
+        self.player1.current_score = int(score1)
+        self.player1.win = bool(win1)
+        self.player2.current_score = int(score2)
+        self.player2.win = bool(win2)
+
+        # check_wins empties the object lists when a game ends
+        self.paddles.clear()
+        self.balls.clear()
+        if shown:
+            self.paddles.append(self.player1.paddle)
+            self.paddles.append(self.player2.paddle)
+            self.balls.append(self.ball)
+
+    def restart(self):
+        self.restore_objects(self.initial_snapshot)
+
+        # a new episode starts from the fresh observation, not from the last frame of the old one
+        self.stored_score1 = 0
+        self.stored_score2 = 0
+        self.repeat_left = 0
+        self.write_observations()
+
+
+if __name__ == "__main__":
+    game = Pong_Sim("player 1", "player 2")
+
+    game_over = False
+    while not game_over:
+        game_over, score = game.step_frame()
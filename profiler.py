@@ -0,0 +1,103 @@
+import json
+import time
+import numpy as np
+
+DEFAULT_CAPACITY = 10000 # frames kept for the timeline, older frames are overwritten
+HISTOGRAM_BINS = np.logspace(2, 9, 29) # 100 ns to 1 s, nanoseconds
+# every frame belongs to a track, physics steps and displayed frames are numbered and traced separately
+PHYSICS_TRACK = 0
+DISPLAY_TRACK = 1
+TRACK_NAMES = ("frame", "display")
+
+class FrameProfiler():
+    # records the wall time of every stage of every frame into preallocated arrays.
+    # stages is a sequence of names, time_stage takes the index of one of them.
+    # a stage that did not run in a frame keeps a start of 0 and is left out of the statistics.
+    # each track gets its own row in the chrome trace
+    def __init__(self, stages, capacity=DEFAULT_CAPACITY):
+        self.stages = tuple(stages)
+        self.capacity = capacity
+        self.starts = np.zeros((capacity, len(self.stages)), dtype=np.int64)
+        self.durations = np.zeros((capacity, len(self.stages)), dtype=np.int64)
+        self.frame_numbers = np.zeros(capacity, dtype=np.int64)
+        self.tracks = np.zeros(capacity, dtype=np.int8)
+        self.frames = 0
+        self.slot = 0
+
+    def begin_frame(self, frame_number, track=PHYSICS_TRACK):
+        self.slot = self.frames % self.capacity
+        self.frame_numbers[self.slot] = frame_number
+        self.tracks[self.slot] = track
+        self.starts[self.slot] = 0
+        self.durations[self.slot] = 0
+        self.frames += 1
+
+    def time_stage(self, stage, function):
+        start = time.perf_counter_ns()
+        result = function()
+        end = time.perf_counter_ns()
+        self.starts[self.slot, stage] = start
+        self.durations[self.slot, stage] = end - start
+        return result
+
+    def get_recorded(self):
+        # the recorded frames in the order they happened
+        count = min(self.frames, self.capacity)
+        if self.frames <= self.capacity:
+            order = np.arange(count)
+        else:
+            order = (np.arange(count) + self.slot + 1) % self.capacity
+        return self.frame_numbers[order], self.tracks[order], self.starts[order], self.durations[order]
+
+    def summary(self):
+        frame_numbers, tracks, starts, durations = self.get_recorded()
+        summary = {}
+        for index, stage in enumerate(self.stages):
+            stage_durations = durations[starts[:, index] != 0, index] / 1000
+            if len(stage_durations) == 0:
+                continue
+            summary[stage] = {"mean_us": float(stage_durations.mean()),
+                              "p50_us": float(np.percentile(stage_durations, 50)),
+                              "p99_us": float(np.percentile(stage_durations, 99)),
+                              "max_us": float(stage_durations.max())}
+        return summary
+
+    def histograms(self, bins=HISTOGRAM_BINS):
+        # per stage counts of durations falling between consecutive bin edges, in nanoseconds
+        frame_numbers, tracks, starts, durations = self.get_recorded()
+        return {stage: np.histogram(durations[starts[:, index] != 0, index], bins=bins)[0]
+                for index, stage in enumerate(self.stages)}
+
+    def slowest_frames(self, count=10, track=PHYSICS_TRACK):
+        frame_numbers, tracks, starts, durations = self.get_recorded()
+        frame_numbers = frame_numbers[tracks == track]
+        durations = durations[tracks == track]
+        order = np.argsort(durations.sum(axis=1))[::-1][:count]
+        return [(int(frame_numbers[i]), dict(zip(self.stages, (durations[i] / 1000).tolist())))
+                for i in order]
+
+    def print_summary(self):
+        for stage, stats in self.summary().items():
+            print(f"{stage:>18}: mean {stats['mean_us']:9.2f} us  p50 {stats['p50_us']:9.2f} us  "
+                  f"p99 {stats['p99_us']:9.2f} us  max {stats['max_us']:9.2f} us")
+
+    def export_chrome_trace(self, path):
+        # complete events for chrome://tracing or Perfetto, one frame span with its stages nested inside
+        frame_numbers, tracks, starts, durations = self.get_recorded()
+        events = []
+        for frame_number, track, frame_starts, frame_durations in zip(frame_numbers, tracks.tolist(), starts, durations):
+            ran = frame_starts != 0
+            if not ran.any():
+                continue
+            frame_start = frame_starts[ran].min()
+            frame_end = (frame_starts + frame_durations)[ran].max()
+            events.append({"name": f"{TRACK_NAMES[track]} {frame_number}", "ph": "X", "pid": 0, "tid": track,
+                           "ts": frame_start / 1000, "dur": (frame_end - frame_start) / 1000})
+            for stage, start, duration in zip(self.stages, frame_starts, frame_durations):
+                if start == 0:
+                    continue
+                events.append({"name": stage, "ph": "X", "pid": 0, "tid": track,
+                               "ts": start / 1000, "dur": duration / 1000})
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
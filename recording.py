@@ -0,0 +1,174 @@
+import struct
+import numpy as np
+from pong_sim import WINNING_SCORE
+
+# file layout: a fixed header, then chunks of chunk_frames frames. Inside a chunk every column
+# is stored contiguously, so a column can be scanned without touching the others. The last
+# chunk is padded, n_frames in the header says how many frames are real
+MAGIC = b"PONGREC1"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQHH") # magic, version, chunk_frames, n_frames, game w, game h
+HEADER_SIZE = 32
+DEFAULT_CHUNK_FRAMES = 4096
+
+COLUMNS = (
+    ("frame", np.uint32),
+    ("paddle1_y", np.float32),
+    ("paddle2_y", np.float32),
+    ("paddle1_speed", np.float32),
+    ("paddle2_speed", np.float32),
+    ("paddle1_momentum", np.float32),
+    ("paddle2_momentum", np.float32),
+    ("ball_x", np.float32),
+    ("ball_y", np.float32),
+    ("ball_speed_x", np.float32),
+    ("ball_speed_y", np.float32),
+    ("action1", np.uint8),
+    ("action2", np.uint8),
+    ("score1", np.uint8),
+    ("score2", np.uint8),
+)
+
+def get_chunk_dtype(chunk_frames):
+    return np.dtype([(name, dtype, (chunk_frames,)) for name, dtype in COLUMNS])
+
+class EpisodeRecorder():
+    # buffers one chunk of frames in memory and writes it out when it is full
+    def __init__(self, path, chunk_frames=DEFAULT_CHUNK_FRAMES, w=640, h=480):
+        self.file = open(path, "wb")
+        self.chunk_frames = chunk_frames
+        self.w = w
+        self.h = h
+        self.chunk = np.zeros((), dtype=get_chunk_dtype(chunk_frames))
+        self.columns = [self.chunk[name] for name, dtype in COLUMNS]
+        self.n_frames = 0
+        self.row = 0
+        self.write_header()
+
+    def write_header(self):
+        header = HEADER.pack(MAGIC, VERSION, self.chunk_frames, self.n_frames, self.w, self.h)
+        self.file.write(header.ljust(HEADER_SIZE, b"\0"))
+
+    def record(self, game):
+        paddle1 = game.player1.paddle
+        paddle2 = game.player2.paddle
+        ball = game.ball
+        values = (game.frame_count,
+                  paddle1.center.y, paddle2.center.y, paddle1.speed.y, paddle2.speed.y,
+                  paddle1.momentum, paddle2.momentum,
+                  ball.center.x, ball.center.y, ball.speed.x, ball.speed.y,
+                  game.action1, game.action2,
+                  game.player1.current_score, game.player2.current_score)
+
+        row = self.row
+        for column, value in zip(self.columns, values):
+            column[row] = value
+
+        self.row += 1
+        self.n_frames += 1
+        if self.row == self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        if self.row == 0:
+            return
+        self.file.write(self.chunk.tobytes())
+        self.chunk[...] = 0
+        self.row = 0
+
+    def close(self):
+        self.flush()
+        self.file.seek(0)
+        self.write_header()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class EpisodeReader():
+    # memory maps a recording, only the pages of the columns that are read get loaded
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            magic, version, chunk_frames, n_frames, w, h = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a pong recording")
+        if version != VERSION:
+            raise ValueError(f"unsupported recording version {version}")
+
+        self.chunk_frames = chunk_frames
+        self.n_frames = n_frames
+        self.w = w
+        self.h = h
+        n_chunks = -(-n_frames // chunk_frames)
+        if n_chunks:
+            self.chunks = np.memmap(path, dtype=get_chunk_dtype(chunk_frames), mode="r",
+                                    offset=HEADER_SIZE, shape=(n_chunks,))
+        else:
+            self.chunks = np.zeros(0, dtype=get_chunk_dtype(chunk_frames))
+
+    def __len__(self):
+        return self.n_frames
+
+    def column(self, name):
+        # one column for every frame, copied out of the chunks
+        return self.chunks[name].reshape(-1)[:self.n_frames]
+
+    def get_frame(self, index):
+        chunk, row = divmod(index, self.chunk_frames)
+        return {name: self.chunks[chunk][name][row] for name, dtype in COLUMNS}
+
+    def apply_frame(self, game, index):
+        # puts the recorded state of one frame into a game so it can be rendered or inspected
+        frame = self.get_frame(index)
+        paddle1 = game.player1.paddle
+        paddle2 = game.player2.paddle
+        paddle1.center.y = float(frame["paddle1_y"])
+        paddle2.center.y = float(frame["paddle2_y"])
+        paddle1.speed.y = float(frame["paddle1_speed"])
+        paddle2.speed.y = float(frame["paddle2_speed"])
+        paddle1.momentum = float(frame["paddle1_momentum"])
+        paddle2.momentum = float(frame["paddle2_momentum"])
+        game.ball.center.set(float(frame["ball_x"]), float(frame["ball_y"]))
+        game.ball.speed.set(float(frame["ball_speed_x"]), float(frame["ball_speed_y"]))
+        game.player1.current_score = int(frame["score1"])
+        game.player2.current_score = int(frame["score2"])
+        game.frame_count = int(frame["frame"])
+
+        # wins follow from the scores, and like restore_objects the object lists are refilled
+        # unless the game had ended, check_wins empties them then
+        game.player1.win = game.player1.current_score >= WINNING_SCORE
+        game.player2.win = game.player2.current_score >= WINNING_SCORE
+        game.game_over = game.player1.win or game.player2.win
+        game.score = max(game.player1.current_score, game.player2.current_score) if game.game_over else 0
+        game.paddles.clear()
+        game.balls.clear()
+        if not game.game_over:
+            game.paddles.append(game.player1.paddle)
+            game.paddles.append(game.player2.paddle)
+            game.balls.append(game.ball)
+
+    def replay(self, game, render=True):
+        # steps through the recording, drawing every frame when the game can render
+        render = render and hasattr(game, "update_screen")
+        for index in range(self.n_frames):
+            self.apply_frame(game, index)
+            if render:
+                game.handle_events()
+                game.update_screen()
+                game.tick_clock()
+            yield index
+
+
+if __name__ == "__main__":
+    import sys
+    from pong_ai import Pong_AI
+
+    reader = EpisodeReader(sys.argv[1])
+    print(f"{len(reader)} frames, ball x range {reader.column('ball_x').min()} to {reader.column('ball_x').max()}")
+
+    game = Pong_AI("player 1", "player 2", reader.w, reader.h, game_speed=60)
+    for index in reader.replay(game):
+        pass
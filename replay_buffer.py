@@ -0,0 +1,113 @@
+import os
+import numpy as np
+from agent import STATE_SIZE
+
+# name, shape per transition, dtype
+FIELDS = (
+    ("states", (STATE_SIZE,), np.float32),
+    ("actions", (), np.uint8),
+    ("rewards", (), np.float32),
+    ("next_states", (STATE_SIZE,), np.float32),
+    ("dones", (), np.bool_),
+)
+
+class ReplayBuffer():
+    # fixed capacity ring of transitions in preallocated arrays, oldest transitions are overwritten.
+    # with a directory path every field is an .npy file opened as a memory map, so the buffer
+    # can be larger than RAM and survives restarts
+    def __init__(self, capacity, path=None, seed=None):
+        self.capacity = capacity
+        self.path = path
+        self.rng = np.random.default_rng(seed)
+        self.arrays = {}
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self.cursor = self.open_array("cursor", (2,), np.int64)
+        else:
+            self.cursor = np.zeros(2, dtype=np.int64)
+
+        for name, shape, dtype in FIELDS:
+            if path is not None:
+                self.arrays[name] = self.open_array(name, (capacity,) + shape, dtype)
+            else:
+                self.arrays[name] = np.zeros((capacity,) + shape, dtype=dtype)
+
+        self.states = self.arrays["states"]
+        self.actions = self.arrays["actions"]
+        self.rewards = self.arrays["rewards"]
+        self.next_states = self.arrays["next_states"]
+        self.dones = self.arrays["dones"]
+
+        # position and size live in cursor so a memory mapped buffer picks up where it left off
+        self.position = int(self.cursor[0])
+        self.size = int(self.cursor[1])
+
+    def open_array(self, name, shape, dtype):
+        file_path = os.path.join(self.path, name + ".npy")
+        if os.path.exists(file_path):
+            array = np.lib.format.open_memmap(file_path, mode="r+")
+            if array.shape != shape or array.dtype != dtype:
+                raise ValueError(f"{file_path} holds {array.dtype} {array.shape}, expected {np.dtype(dtype)} {shape}")
+            return array
+        return np.lib.format.open_memmap(file_path, mode="w+", dtype=dtype, shape=shape)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, done):
+        position = self.position
+        self.states[position] = state
+        self.actions[position] = action
+        self.rewards[position] = reward
+        self.next_states[position] = next_state
+        self.dones[position] = done
+
+        self.position = (position + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        count = len(actions)
+        slots = (self.position + np.arange(count)) % self.capacity
+        self.states[slots] = states
+        self.actions[slots] = actions
+        self.rewards[slots] = rewards
+        self.next_states[slots] = next_states
+        self.dones[slots] = dones
+
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def sample(self, batch_size):
+        indices = self.rng.integers(0, self.size, size=batch_size)
+        return (self.states[indices], self.actions[indices], self.rewards[indices],
+                self.next_states[indices], self.dones[indices])
+
+    def flush(self):
+        self.cursor[0] = self.position
+        self.cursor[1] = self.size
+        if self.path is not None:
+            for array in self.arrays.values():
+                array.flush()
+            self.cursor.flush()
+
+
+if __name__ == "__main__":
+    import time
+    from pong_sim import Pong_Sim
+
+    buffer = ReplayBuffer(100000, seed=0)
+    game = Pong_Sim("player 1", "player 2", seed=0)
+    game.replay_buffer = buffer
+
+    start = time.perf_counter()
+    for _ in range(20000):
+        game_over, score = game.step_frame()
+        if game_over:
+            game.restart()
+    elapsed = time.perf_counter() - start
+
+    states, actions, rewards, next_states, dones = buffer.sample(256)
+    print(f"{len(buffer)} transitions stored at {len(buffer) / elapsed:.0f} per second, "
+          f"{int(buffer.dones.sum())} episode ends, sampled {len(actions)}")
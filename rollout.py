@@ -0,0 +1,174 @@
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from agent import STATE_SIZE
+from pong_sim import Pong_Sim
+
+DEFAULT_CAPACITY = 4096 # transitions per worker ring
+
+# name, shape per worker, dtype
+BUFFER_LAYOUT = (
+    ("observations", (2, STATE_SIZE), np.float32),
+    ("actions", (2,), np.int8),
+    ("rewards", (2,), np.float32),
+    ("dones", (), np.bool_),
+)
+
+class RolloutBuffers():
+    # one ring per worker for every array in BUFFER_LAYOUT, all in shared memory.
+    # heads[k] counts the transitions worker k has written so far, slot = head % capacity.
+    # a worker fills a slot before bumping its head, so everything below the head is readable.
+    # observations[k, i] is what the agents saw when they chose actions[k, i], the next
+    # observation is in slot i + 1 unless dones[k, i]
+    def __init__(self, n_workers, capacity=DEFAULT_CAPACITY, names=None):
+        self.n_workers = n_workers
+        self.capacity = capacity
+        self.owner = names is None
+        self.blocks = {}
+        self.arrays = {}
+
+        layout = BUFFER_LAYOUT + (("heads", None, np.int64),)
+        for name, item_shape, dtype in layout:
+            if item_shape is None:
+                shape = (n_workers,)
+            else:
+                shape = (n_workers, capacity) + item_shape
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+            if self.owner:
+                block = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                block = shared_memory.SharedMemory(name=names[name])
+            self.blocks[name] = block
+            self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+        if self.owner:
+            self.arrays["heads"][:] = 0
+
+        self.observations = self.arrays["observations"]
+        self.actions = self.arrays["actions"]
+        self.rewards = self.arrays["rewards"]
+        self.dones = self.arrays["dones"]
+        self.heads = self.arrays["heads"]
+
+    def get_names(self):
+        return {name: block.name for name, block in self.blocks.items()}
+
+    def read(self, worker, start, count):
+        # copies transitions [start, start + count) of one worker, start must still be in the ring
+        slots = np.arange(start, start + count) % self.capacity
+        return (self.observations[worker, slots], self.actions[worker, slots],
+                self.rewards[worker, slots], self.dones[worker, slots])
+
+    def close(self):
+        self.arrays.clear()
+        self.observations = self.actions = self.rewards = self.dones = self.heads = None
+        for block in self.blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self.blocks.clear()
+
+def run_worker(worker, names, n_workers, capacity, stop_event, max_steps=None, seed=None, action_repeat=1):
+    buffers = RolloutBuffers(n_workers, capacity, names)
+    game = Pong_Sim(f"worker {worker} player 1", f"worker {worker} player 2", seed=seed, action_repeat=action_repeat)
+
+    observations = buffers.observations[worker]
+    actions = buffers.actions[worker]
+    rewards = buffers.rewards[worker]
+    dones = buffers.dones[worker]
+    heads = buffers.heads
+
+    steps = 0
+    while not stop_event.is_set() and (max_steps is None or steps < max_steps):
+        score1 = game.player1.current_score
+        score2 = game.player2.current_score
+
+        # the observation the actions are chosen from, after a restart that is the fresh episode's
+        slot = steps % capacity
+        observations[slot] = game.observations
+
+        # both sides are driven by their player's agent, one slot per decision
+        game_over, _ = game.step_frame()
+        while game.repeat_left:
+            game_over, _ = game.step_frame()
+
+        actions[slot, 0] = game.action1
+        actions[slot, 1] = game.action2
+        scored1 = game.player1.current_score - score1
+        scored2 = game.player2.current_score - score2
+        rewards[slot, 0] = scored1 - scored2
+        rewards[slot, 1] = scored2 - scored1
+        dones[slot] = game_over
+
+        steps += 1
+        heads[worker] = steps
+
+        if game_over:
+            game.restart()
+
+    del observations, actions, rewards, dones, heads
+    buffers.close()
+
+class RolloutPool():
+    # runs n_workers headless games in separate processes writing into RolloutBuffers
+    def __init__(self, n_workers, capacity=DEFAULT_CAPACITY, max_steps=None, seed=None, action_repeat=1):
+        # independent, reproducible random streams for every worker
+        worker_seeds = np.random.SeedSequence(seed).spawn(n_workers)
+        self.buffers = RolloutBuffers(n_workers, capacity)
+        self.stop_event = mp.Event()
+        self.read_heads = np.zeros(n_workers, dtype=np.int64)
+        self.processes = [mp.Process(target=run_worker,
+                                     args=(worker, self.buffers.get_names(), n_workers, capacity,
+                                           self.stop_event, max_steps, worker_seeds[worker], action_repeat),
+                                     daemon=True)
+                          for worker in range(n_workers)]
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+
+    def collect(self, worker):
+        # everything worker wrote since the last collect, older transitions that were
+        # already overwritten in the ring are skipped. The slot at head is being written,
+        # so at most capacity - 1 transitions are readable
+        capacity = self.buffers.capacity
+        head = int(self.buffers.heads[worker])
+        start = max(self.read_heads[worker], head - capacity + 1)
+        transitions = self.buffers.read(worker, start, head - start)
+
+        # the worker keeps writing while the copy is made, drop what it overwrote meanwhile
+        overwritten = int(self.buffers.heads[worker]) - capacity + 1 - start
+        if overwritten > 0:
+            transitions = tuple(array[overwritten:] for array in transitions)
+        self.read_heads[worker] = head
+        return transitions
+
+    def stop(self):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join()
+        self.buffers.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    n_workers = 4
+    with RolloutPool(n_workers) as pool:
+        total = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < 5:
+            time.sleep(0.1)
+            for worker in range(n_workers):
+                observations, actions, rewards, dones = pool.collect(worker)
+                total += len(dones)
+        elapsed = time.perf_counter() - start
+
+    print(f"collected {total} transitions, {total / elapsed:.0f} per second")
@@ -0,0 +1,27 @@
+from collections import OrderedDict
+
+DEFAULT_MAX_SIZE = 32 # surfaces kept before the least recently used one is dropped
+
+class TextCache():
+    # font.render is slow, so rendered surfaces are kept per (text, color)
+    def __init__(self, font, max_size=DEFAULT_MAX_SIZE, antialias=False):
+        self.font = font
+        self.max_size = max_size
+        self.antialias = antialias
+        self.surfaces = OrderedDict()
+
+    def render(self, text, color):
+        key = (text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+
+        surface = self.font.render(text, self.antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
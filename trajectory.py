@@ -0,0 +1,163 @@
+import math
+import numpy as np
+import pong_log
+from agent import Direction, STATE_SIZE
+from pong_sim import DEFAULT_PADDLE_SPEED
+
+# between paddle hits the ball flies in a straight line and only bounces off the ceiling and floor,
+# so its path can be unfolded into a straight line and folded back with a triangle wave.
+# exact for swept collisions, close for the default frame by frame collisions which bounce a
+# ball once it already overlaps a wall
+
+def fold(y, low, high):
+    # maps an unfolded y coordinate back between low and high, returns (y, number of bounces)
+    span = high - low
+    bounces = math.floor((y - low) / span)
+    offset = (y - low) - bounces * span
+    if bounces % 2:
+        return high - offset, bounces
+    return low + offset, bounces
+
+def predict_arrival(ball_x, ball_y, speed_x, speed_y, target_x, game_h, ball_h):
+    # time in ticks until the ball center reaches target_x and its y there, (None, None) when moving away
+    if speed_x == 0 or (target_x - ball_x) * speed_x < 0:
+        return None, None
+
+    time = (target_x - ball_x) / speed_x
+    y, bounces = fold(ball_y + speed_y * time, ball_h/2, game_h - ball_h/2)
+    return time, y
+
+def predict_arrivals(ball_x, ball_y, speed_x, speed_y, target_x, game_h, ball_h):
+    # array version of predict_arrival, times are inf where the ball moves away
+    ball_x, ball_y, speed_x, speed_y = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64)
+                                                             for a in (ball_x, ball_y, speed_x, speed_y)))
+    low = ball_h/2
+    span = game_h - ball_h - 0.0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        time = (target_x - ball_x) / speed_x
+    time = np.where((speed_x != 0) & (time >= 0), time, np.inf)
+
+    unfolded = ball_y + speed_y * np.where(np.isfinite(time), time, 0) - low
+    offset = np.mod(unfolded, 2 * span)
+    y = low + np.where(offset > span, 2 * span - offset, offset)
+    return time, y
+
+def advance_ball(ball, ticks, game_h):
+    # moves a ball in flight by many ticks at once, bouncing off the ceiling and floor on the way
+    y, bounces = fold(ball.center.y + ball.speed.y * ticks, ball.h/2, game_h - ball.h/2)
+    ball.center.x += ball.speed.x * ticks
+    ball.center.y = y
+    if bounces % 2:
+        ball.speed.y = -ball.speed.y
+
+def get_face_x(paddle, ball, player):
+    # x of the ball center when it touches the front of this player's paddle
+    if player == 1:
+        return paddle.center.x + paddle.w/2 + ball.w/2
+    return paddle.center.x - paddle.w/2 - ball.w/2
+
+def predict_ball(game, player):
+    # (ticks, y) until the ball reaches the front of player's paddle, (None, None) if it is moving away
+    paddle = game.player1.paddle if player == 1 else game.player2.paddle
+    ball = game.ball
+    return predict_arrival(ball.center.x, ball.center.y, ball.speed.x, ball.speed.y,
+                           get_face_x(paddle, ball, player), game.h, ball.h)
+
+def skip_idle_frames(game, max_frames=None):
+    # jumps a headless swept collision game straight to the frame before the ball reaches a paddle.
+    # only done while both paddles stand still, nothing else changes in those frames.
+    # the agents decide again on the frame after the skip. Returns the number of frames skipped
+    if not game.swept_collisions or not game.balls:
+        return 0
+    paddle1 = game.player1.paddle
+    paddle2 = game.player2.paddle
+    ball = game.ball
+    if paddle1.speed.y != 0 or paddle2.speed.y != 0 or ball.reset_wait >= 0 or ball.speed.x == 0:
+        return 0
+
+    player = 1 if ball.speed.x < 0 else 2
+    paddle = paddle1 if player == 1 else paddle2
+    time = (get_face_x(paddle, ball, player) - ball.center.x) / ball.speed.x
+    frames = math.floor(time / game.dt) - 1
+    if max_frames is not None:
+        frames = min(frames, max_frames)
+    if frames <= 0:
+        return 0
+
+    advance_ball(ball, frames * game.dt, game.h)
+    paddle1.momentum = 0
+    paddle2.momentum = 0
+    game.frame_count += frames
+    pong_log.frame = game.frame_count
+
+    # a held action ends with the skip, its transition reaches over the skipped frames
+    if game.repeat_left:
+        game.repeat_left = 0
+        game.send_states()
+    else:
+        game.write_observations()
+    if game.recorder is not None:
+        game.recorder.record(game)
+    return frames
+
+class TrackingPolicy():
+    # scripted baseline: moves the paddle toward where the ball will arrive, or back to the middle
+    # when the ball is moving away. Follows the batched policy interface, rows of the observation
+    # matrix alternate between player 1 and player 2 like Pong_Sim.observations, unless side is
+    # given, then every row belongs to that player (for use as an Agent brain)
+    def __init__(self, game_state_parameters, paddle_offset=20, paddle_w=10, ball_w=10, ball_h=10, side=None):
+        self.game_w = game_state_parameters.game_w
+        self.game_h = game_state_parameters.game_h
+        self.ball_h = ball_h
+        self.side = side
+        self.face_x = (paddle_offset + paddle_w/2 + ball_w/2,
+                       self.game_w - paddle_offset - paddle_w/2 - ball_w/2)
+        self.dead_zone = DEFAULT_PADDLE_SPEED / 2
+
+        # undo the observation normalization
+        scale, offset = game_state_parameters.get_normalization()
+        self.scale = 1 / scale.astype(np.float64)
+        self.offset = offset.astype(np.float64)
+
+    def act(self, observations):
+        states = (np.asarray(observations, dtype=np.float64) - self.offset) * self.scale
+        n = len(states)
+        if self.side is None:
+            face_x = np.where(np.arange(n) % 2 == 0, self.face_x[0], self.face_x[1])
+        else:
+            face_x = np.full(n, self.face_x[self.side - 1])
+
+        time, y = predict_arrivals(states[:, 6], states[:, 7], states[:, 8], states[:, 9],
+                                   face_x, self.game_h, self.ball_h)
+        target = np.where(np.isfinite(time), y, self.game_h / 2)
+
+        actions = np.full(n, Direction.neutral.value)
+        paddle_y = states[:, 0]
+        actions[target < paddle_y - self.dead_zone] = Direction.up.value
+        actions[target > paddle_y + self.dead_zone] = Direction.down.value
+        return actions
+
+    def choose_direction(self, observation):
+        return Direction(int(self.act(observation.reshape(1, STATE_SIZE))[0]))
+
+
+if __name__ == "__main__":
+    from pong_sim import Pong_Sim
+    from agent import RandomPolicy
+
+    wins = 0
+    games = 50
+    for index in range(games):
+        game = Pong_Sim("tracker", "random", seed=index, swept_collisions=True)
+        tracker = TrackingPolicy(game.game_state_parameters, side=1)
+        random_policy = RandomPolicy(np.random.default_rng(index))
+        game_over = False
+        while not game_over:
+            action1 = int(tracker.act(game.observations[0:1])[0])
+            action2 = int(random_policy.act(game.observations[1:2])[0])
+            game.apply_actions(action1, action2)
+            game_over, _ = game.step_physics()
+            game.send_states()
+        wins += game.player1.win
+    print(f"tracking policy won {wins} of {games} games against random play")